@@ -8,166 +8,74 @@ Uses trained models for:
 """
 import sys
 import os
-
-# Suppress warnings at environment level
-os.environ['PYTHONWARNINGS'] = 'ignore'
-
+import collections
+import functools
+import importlib.util
 import json
 import re
-import warnings
+import signal
+from concurrent.futures import ThreadPoolExecutor
 
-# Suppress sklearn version warnings and other warnings
-warnings.filterwarnings('ignore')
-warnings.simplefilter('ignore')
-
-import pickle
-import joblib
-import pandas as pd  # type: ignore
+# Warnings (e.g. sklearn version mismatches on unpickle) are silenced by the
+# caller with `python -W ignore`; joblib is imported when a model is loaded
 import numpy as np  # type: ignore
 
+try:
+    import orjson  # optional, faster frame encoding
+except ImportError:
+    orjson = None
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ML_DIR = os.path.join(BASE_DIR, "..", "ml")
 MODELS_DIR = os.path.join(ML_DIR, "models")
 
-
-class MLChatbot:
-    def __init__(self):
-        self.models = {}
-        self.load_models()
-    
-    def load_models(self):
-        """Load all available ML models"""
-        try:
-            # Content recommendation model
-            content_path = os.path.join(MODELS_DIR, "content_model.pkl")
-            if os.path.exists(content_path):
-                with open(content_path, 'rb') as f:
-                    self.models['content'] = pickle.load(f)
-            
-            # Performance models
-            for mode in ['engagement', 'conversion', 'roi']:
-                model_path = os.path.join(MODELS_DIR, f"perf_{mode}_model.pkl")
-                scaler_path = os.path.join(MODELS_DIR, f"perf_{mode}_scaler.pkl")
-                if os.path.exists(model_path) and os.path.exists(scaler_path):
-                    self.models[f'perf_{mode}'] = {
-                        'model': joblib.load(model_path),
-                        'scaler': joblib.load(scaler_path)
-                    }
-            
-            # Segmentation models
-            for mode in ['behavior', 'campaign', 'engagement']:
-                seg_model = 'segmentation_model.pkl' if mode == 'behavior' else f'{mode}_segmentation_model.pkl'
-                seg_scaler = 'segmentation_scaler.pkl' if mode == 'behavior' else f'{mode}_segmentation_scaler.pkl'
-                model_path = os.path.join(MODELS_DIR, seg_model)
-                scaler_path = os.path.join(MODELS_DIR, seg_scaler)
-                if os.path.exists(model_path) and os.path.exists(scaler_path):
-                    self.models[f'segment_{mode}'] = {
-                        'model': joblib.load(model_path),
-                        'scaler': joblib.load(scaler_path)
-                    }
-        except Exception as e:
-            print(f"Warning: Could not load some models: {e}", file=sys.stderr)
-    
-    def predict_performance(self, metrics, mode='roi'):
-        """Predict campaign performance using ML models"""
-        try:
-            model_key = f'perf_{mode}'
-            if model_key not in self.models:
-                return None
-            
-            features = ['impressions', 'clicks', 'spend', 'conversions', 
-                       'sessions', 'add_to_carts', 'avg_session_duration']
-            
-            X = pd.DataFrame([metrics])[features]
-            X_scaled = self.models[model_key]['scaler'].transform(X)
-            prediction = self.models[model_key]['model'].predict(X_scaled)[0]
-            
-            return prediction
-        except Exception as e:
-            print(f"Performance prediction error: {e}", file=sys.stderr)
-            return None
-    
-    def recommend_content(self, metrics):
-        """Get content recommendations based on metrics"""
-        try:
-            if 'content' not in self.models:
-                return None
-            
-            features = ['avg_engagement_rate', 'avg_conversion_rate', 
-                       'avg_roas', 'sample_size']
-            X = pd.DataFrame([metrics])[features]
-            score = self.models['content'].predict(X)[0]
-            
-            return score
-        except Exception as e:
-            print(f"Content recommendation error: {e}", file=sys.stderr)
-            return None
-    
-    def segment_customer(self, customer_data, mode='behavior'):
-        """Segment customer using ML clustering"""
-        try:
-            model_key = f'segment_{mode}'
-            if model_key not in self.models:
-                return None
-            
-            if mode == 'behavior':
-                features = ['monthly_spend', 'avg_order_value', 'orders_per_month', 'visits_per_month']
-            elif mode == 'campaign':
-                features = ['monthly_spend', 'avg_order_value', 'orders_per_month']
-            else:  # engagement
-                features = ['age', 'visits_per_month', 'category_preference_score']
-            
-            X = pd.DataFrame([customer_data])[features]
-            X_scaled = self.models[model_key]['scaler'].transform(X)
-            segment = self.models[model_key]['model'].predict(X_scaled)[0]
-            
-            personas = {0: "Eco-Lux Loyalists", 1: "Aspiring Aesthetes", 2: "Eco-Gift Shoppers"}
-            return personas.get(segment, f"Segment {segment}")
-        except Exception as e:
-            print(f"Segmentation error: {e}", file=sys.stderr)
-            return None
-    
-    def analyze_intent(self, message):
-        """Analyze user message to determine intent"""
-        msg_lower = message.lower()
-        
-        # Performance analysis intent
-        if any(word in msg_lower for word in ['performance', 'roi', 'roas', 'conversion', 'ctr', 'engagement']):
-            return 'performance'
-        
-        # Content recommendation intent
-        if any(word in msg_lower for word in ['content', 'recommend', 'suggestion', 'campaign', 'creative']):
-            return 'content'
-        
-        # Customer segmentation intent
-        if any(word in msg_lower for word in ['segment', 'customer', 'persona', 'audience', 'target']):
-            return 'segmentation'
-        
-        # Prediction intent
-        if any(word in msg_lower for word in ['predict', 'forecast', 'estimate', 'expect']):
-            return 'prediction'
-        
-        # General help
-        return 'general'
-    
-    def generate_response(self, message, context=None):
-        """Generate intelligent response using ML models"""
-        intent = self.analyze_intent(message)
-        
-        if intent == 'performance':
-            return self._handle_performance_query(message, context)
-        elif intent == 'content':
-            return self._handle_content_query(message, context)
-        elif intent == 'segmentation':
-            return self._handle_segmentation_query(message, context)
-        elif intent == 'prediction':
-            return self._handle_prediction_query(message, context)
-        else:
-            return self._handle_general_query(message)
-    
-    def _handle_performance_query(self, message, context):
-        """Handle performance-related queries"""
-        return """📊 **Performance Reporting**
+# Model loading helpers are shared with the ml/ scoring scripts
+sys.path.insert(0, ML_DIR)
+from model_utils import (  # noqa: E402
+    TreeliteModel, is_fresh, lib_info_path, load_pickle, pipeline_input_dtype, scaler_params, standardize,
+)
+
+HAS_ONNXRUNTIME = importlib.util.find_spec('onnxruntime') is not None
+HAS_TL2CGEN = importlib.util.find_spec('tl2cgen') is not None
+
+# Input features for each model, in the order the models were trained on
+PERF_FEATURES = ['impressions', 'clicks', 'spend', 'conversions',
+                 'sessions', 'add_to_carts', 'avg_session_duration']
+
+FEATURES = {
+    'content': ['avg_engagement_rate', 'avg_conversion_rate',
+                'avg_roas', 'sample_size'],
+    'perf_engagement': PERF_FEATURES,
+    'perf_conversion': PERF_FEATURES,
+    'perf_roi': PERF_FEATURES,
+    'segment_behavior': ['monthly_spend', 'avg_order_value', 'orders_per_month', 'visits_per_month'],
+    'segment_campaign': ['monthly_spend', 'avg_order_value', 'orders_per_month'],
+    'segment_engagement': ['age', 'visits_per_month', 'category_preference_score'],
+}
+
+# Files behind each model key under MODELS_DIR
+MODEL_FILES = {
+    'content': {'model': 'content_model.pkl'},
+    'perf_engagement': {'model': 'perf_engagement_model.pkl', 'scaler': 'perf_engagement_scaler.pkl'},
+    'perf_conversion': {'model': 'perf_conversion_model.pkl', 'scaler': 'perf_conversion_scaler.pkl'},
+    'perf_roi': {'model': 'perf_roi_model.pkl', 'scaler': 'perf_roi_scaler.pkl'},
+    'segment_behavior': {'model': 'segmentation_model.pkl', 'scaler': 'segmentation_scaler.pkl'},
+    'segment_campaign': {'model': 'campaign_segmentation_model.pkl', 'scaler': 'campaign_segmentation_scaler.pkl'},
+    'segment_engagement': {'model': 'engagement_segmentation_model.pkl', 'scaler': 'engagement_segmentation_scaler.pkl'},
+}
+
+# Cluster id -> persona name for the segmentation models
+SEGMENT_PERSONAS = {0: "Eco-Lux Loyalists", 1: "Aspiring Aesthetes", 2: "Eco-Gift Shoppers"}
+
+# Word frames written per stdout write when streaming a reply
+WORDS_PER_WRITE = 16
+
+# Most recent predictions kept per chatbot, keyed by (model_key, feature values)
+PREDICTION_CACHE_SIZE = 2048
+
+
+# Static replies, built once at import so handlers are a constant lookup
+PERFORMANCE_HELP = """📊 **Performance Reporting**
 
 To analyze your campaign performance:
 
@@ -180,10 +88,8 @@ To analyze your campaign performance:
 4. Click "Analyze" to get ML-powered predictions
 
 The system will show you top-performing campaigns and detailed metrics to optimize your marketing strategy."""
-    
-    def _handle_content_query(self, message, context):
-        """Handle content recommendation queries"""
-        return """📝 **Content Recommendation**
+
+CONTENT_HELP = """📝 **Content Recommendation**
 
 To get AI-powered content recommendations:
 
@@ -197,10 +103,8 @@ To get AI-powered content recommendations:
    • Historical performance
 
 The ML model will rank content strategies and suggest the best combinations of persona, channel, and format for your campaigns."""
-    
-    def _handle_segmentation_query(self, message, context):
-        """Handle customer segmentation queries"""
-        return """👥 **Customer Segmentation**
+
+SEGMENTATION_HELP = """👥 **Customer Segmentation**
 
 To segment your customers using AI:
 
@@ -218,10 +122,8 @@ The ML model will group customers into personas:
 • **Eco-Gift Shoppers** - Eco-friendly gift buyers
 
 Use these insights to create targeted marketing campaigns."""
-    
-    def _handle_prediction_query(self, message, context):
-        """Handle prediction queries"""
-        return """🔮 **ML Predictions**
+
+PREDICTION_HELP = """🔮 **ML Predictions**
 
 To get AI predictions:
 
@@ -241,13 +143,8 @@ To get AI predictions:
 → Choose segmentation type
 
 Each page has ML models trained on your data for accurate predictions!"""
-    
-    def _handle_general_query(self, message):
-        """Handle general queries"""
-        msg_lower = message.lower()
-        
-        if any(word in msg_lower for word in ['hello', 'hi', 'hey']):
-            return """👋 Hello! I'm your iMark AI assistant. I can guide you to:
+
+GREETING_REPLY = """👋 Hello! I'm your iMark AI assistant. I can guide you to:
 
 📊 **Performance Reporting** - Analyze campaign ROI and metrics
 📝 **Content Recommendation** - Get AI content suggestions  
@@ -255,9 +152,8 @@ Each page has ML models trained on your data for accurate predictions!"""
 📈 **Dashboard** - View your marketing overview
 
 Ask me about any of these features and I'll show you how to use them!"""
-        
-        if any(word in msg_lower for word in ['help', 'what can you do', 'capabilities', 'features']):
-            return """🎯 **iMark Platform Guide**
+
+HELP_REPLY = """🎯 **iMark Platform Guide**
 
 I can help you navigate to:
 
@@ -267,12 +163,10 @@ I can help you navigate to:
 4. **📈 Dashboard** - View your marketing analytics overview
 
 Just ask me about any feature (e.g., "How do I use performance reporting?" or "Show me segmentation") and I'll guide you!"""
-        
-        if 'thank' in msg_lower:
-            return "You're welcome! Feel free to ask if you need help navigating to any page or using a feature. 😊"
-        
-        if any(word in msg_lower for word in ['dashboard', 'home', 'overview']):
-            return """📈 **Dashboard**
+
+THANKS_REPLY = "You're welcome! Feel free to ask if you need help navigating to any page or using a feature. 😊"
+
+DASHBOARD_REPLY = """📈 **Dashboard**
 
 Your dashboard shows:
 • Recent insights and reports
@@ -280,9 +174,8 @@ Your dashboard shows:
 • Performance summaries
 
 Navigate to the **Dashboard** from the main menu to see your marketing analytics overview."""
-        
-        if any(word in msg_lower for word in ['upload', 'file', 'data', 'csv']):
-            return """📁 **Uploading Data**
+
+UPLOAD_REPLY = """📁 **Uploading Data**
 
 For each feature, you need specific CSV files:
 
@@ -293,8 +186,8 @@ For each feature, you need specific CSV files:
 **Segmentation**: customer_id, monthly_spend, avg_order_value, orders_per_month, visits_per_month, age, category_preference_score
 
 Upload your CSV on the respective page and the AI will analyze it!"""
-        
-        return """🤖 **iMark AI Assistant**
+
+DEFAULT_REPLY = """🤖 **iMark AI Assistant**
 
 I'm here to help you navigate the platform! Ask me about:
 
@@ -305,9 +198,435 @@ I'm here to help you navigate the platform! Ask me about:
 
 I'll guide you to the right page with step-by-step instructions!"""
 
+# Intent keywords, checked in order. Each list is compiled into one
+# alternation so a message is scanned once per intent, in C. Plain substring
+# matching (no word boundaries) keeps "conversions" -> "conversion" etc.
+INTENT_PATTERNS = [
+    # Performance analysis intent
+    ('performance', re.compile('performance|roi|roas|conversion|ctr|engagement')),
+    # Content recommendation intent
+    ('content', re.compile('content|recommend|suggestion|campaign|creative')),
+    # Customer segmentation intent
+    ('segmentation', re.compile('segment|customer|persona|audience|target')),
+    # Prediction intent
+    ('prediction', re.compile('predict|forecast|estimate|expect')),
+]
+
+# General-query keywords and their replies, checked in order
+GENERAL_REPLIES = [
+    (re.compile('hello|hi|hey'), GREETING_REPLY),
+    (re.compile('help|what can you do|capabilities|features'), HELP_REPLY),
+    (re.compile('thank'), THANKS_REPLY),
+    (re.compile('dashboard|home|overview'), DASHBOARD_REPLY),
+    (re.compile('upload|file|data|csv'), UPLOAD_REPLY),
+]
+
+
+class OnnxModel:
+    """sklearn-style predict() over an onnxruntime session"""
+    def __init__(self, path):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def predict(self, X):
+        # First output is the prediction (label for KMeans, value for regressors)
+        outputs = self.session.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})
+        return outputs[0].ravel()
+
+
+def load_model_file(path):
+    """Load a pickled sklearn object, an ONNX model, or a compiled tree library"""
+    if path.endswith('.so'):
+        return TreeliteModel(path)
+    if path.endswith('.onnx'):
+        return OnnxModel(path)
+    return load_pickle(path)
+
+
+class MLChatbot:
+    def __init__(self):
+        # Models are loaded lazily by _get(); only the paths are resolved up front
+        self.models = {}
+        self._model_paths = self._scan_models()
+        self._pred_cache = collections.OrderedDict()
+        # One reusable 1xN input row per model instead of a DataFrame per call
+        self._feat_buf = {key: np.empty((1, len(fs)), dtype=np.float64) for key, fs in FEATURES.items()}
+        # Scaled-row buffers and scaler parameters are filled in by _get()
+        self._scaled_buf = {}
+        self._scaler_params = {}
+        # Responses are deterministic given the loaded models, so repeated
+        # (message, context) pairs are answered straight from the cache
+        self._generate_cached = functools.lru_cache(maxsize=1024)(self._generate_uncached)
+    
+    def _scan_models(self):
+        """Map each model key to its files, keeping only models present on disk"""
+        try:
+            available = set(os.listdir(MODELS_DIR))
+        except OSError as e:
+            print(f"Warning: Could not read models directory: {e}", file=sys.stderr)
+            return {}
+        
+        paths = {}
+        for key, files in MODEL_FILES.items():
+            # Newer trainers save scaler + model together as <prefix>_pipeline.pkl
+            pipeline_name = files['model'].replace('_model.pkl', '_pipeline.pkl')
+            if 'scaler' in files and pipeline_name in available:
+                paths[key] = {'pipeline': os.path.join(MODELS_DIR, pipeline_name)}
+            elif all(name in available for name in files.values()):
+                paths[key] = {part: os.path.join(MODELS_DIR, name) for part, name in files.items()}
+            else:
+                continue
+            
+            # Prefer a compiled tree library (ml/compile_tree_models.py), then
+            # an ONNX export (ml/convert_models.py), over the pickle. Libraries
+            # need their <lib>.json, which records the input dtype to feed them
+            stem = os.path.splitext(files['model'])[0]
+            exports = []
+            if HAS_TL2CGEN and lib_info_path(stem + '.so') in available:
+                exports.append(stem + '.so')
+            if HAS_ONNXRUNTIME:
+                exports.append(stem + '.onnx')
+            
+            for export in exports:
+                if export not in available:
+                    continue
+                # An export older than the pickles it replaces is from an earlier
+                # training run and would not match the current scaler
+                export_path = os.path.join(MODELS_DIR, export)
+                if is_fresh(export_path, *paths[key].values()):
+                    paths[key]['model'] = export_path
+                    break
+                print(f"Warning: ignoring {export}, it is older than the trained model; "
+                      f"re-run the export script", file=sys.stderr)
+        return paths
+    
+    def _get(self, key):
+        """Return the model for key, loading it from disk on first use"""
+        if key in self.models:
+            return self.models[key]
+        
+        paths = self._model_paths.get(key)
+        if paths is None:
+            return None
+        
+        try:
+            loaded = {part: load_model_file(path) for part, path in paths.items()}
+        except Exception as e:
+            print(f"Warning: Could not load model '{key}': {e}", file=sys.stderr)
+            # Don't retry a broken file on every request
+            del self._model_paths[key]
+            return None
+        
+        # Split a saved Pipeline into its steps; a compiled/ONNX model file
+        # found by _scan_models takes precedence over the pickled estimator
+        pipeline = loaded.pop('pipeline', None)
+        input_dtype = None
+        if pipeline is not None:
+            loaded.setdefault('scaler', pipeline.named_steps['scaler'])
+            loaded.setdefault('model', pipeline.named_steps['model'])
+            input_dtype = pipeline_input_dtype(pipeline)
+        
+        scaler = loaded.get('scaler')
+        if scaler is not None and hasattr(scaler, 'scale_'):
+            scaling = scaler_params(scaler, len(FEATURES[key]), input_dtype)
+            self._scaler_params[key] = scaling
+            # Scaled rows are kept in the dtype the pipeline scales in (float32
+            # for the current trainers), so models see exactly their training inputs
+            self._scaled_buf[key] = np.empty((1, len(FEATURES[key])), dtype=scaling[0].dtype)
+        
+        self.models[key] = loaded
+        return loaded
+    
+    def load_models(self):
+        """Load all available ML models"""
+        # Files are independent, so overlap their disk reads and unpickling
+        keys = [key for key in self._model_paths if key not in self.models]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self._get, keys))
+    
+    def _cached_prediction(self, key):
+        """Return a previously computed prediction for key, or None"""
+        if key in self._pred_cache:
+            self._pred_cache.move_to_end(key)
+            return self._pred_cache[key]
+        return None
+    
+    def _store_prediction(self, key, value):
+        """Remember a prediction, evicting the least recently used entry"""
+        self._pred_cache[key] = value
+        if len(self._pred_cache) > PREDICTION_CACHE_SIZE:
+            self._pred_cache.popitem(last=False)
+        return value
+    
+    def _scale(self, model_key, entry, X):
+        """Apply the model's scaler to X, inlined via standardize() when possible"""
+        if 'scaler' not in entry:
+            return X
+        
+        params = self._scaler_params.get(model_key)
+        if params is None:
+            return entry['scaler'].transform(X)
+        
+        # Single rows reuse a preallocated buffer; the raw row is left untouched
+        out = self._scaled_buf[model_key] if X.shape[0] == 1 else None
+        return standardize(X, params, out=out)
+    
+    def _predict(self, model_key, values, X=None):
+        """Run one feature row through a model (and its scaler), via the cache"""
+        entry = self._get(model_key)
+        if entry is None:
+            return None
+        
+        cache_key = (model_key, values)
+        cached = self._cached_prediction(cache_key)
+        if cached is not None:
+            return cached
+        
+        if X is None:
+            X = self._feat_buf[model_key]
+            X[0, :] = values
+        X = self._scale(model_key, entry, X)
+        prediction = entry['model'].predict(X)[0]
+        
+        return self._store_prediction(cache_key, prediction)
+    
+    def predict_performance(self, metrics, mode='roi'):
+        """Predict campaign performance using ML models"""
+        try:
+            values = tuple(metrics[f] for f in PERF_FEATURES)
+            return self._predict(f'perf_{mode}', values)
+        except Exception as e:
+            print(f"Performance prediction error: {e}", file=sys.stderr)
+            return None
+    
+    def predict_performance_all(self, metrics):
+        """Predict ROI, conversion and engagement from one shared feature row"""
+        predictions = {'roi': None, 'conversion': None, 'engagement': None}
+        try:
+            # All three performance models take the same inputs, so the row is built once
+            values = tuple(metrics[f] for f in PERF_FEATURES)
+            X = self._feat_buf['perf_roi']
+            X[0, :] = values
+            
+            for mode in predictions:
+                predictions[mode] = self._predict(f'perf_{mode}', values, X)
+        except Exception as e:
+            print(f"Performance prediction error: {e}", file=sys.stderr)
+        
+        return predictions
+    
+    def recommend_content(self, metrics):
+        """Get content recommendations based on metrics"""
+        try:
+            values = tuple(metrics[f] for f in FEATURES['content'])
+            return self._predict('content', values)
+        except Exception as e:
+            print(f"Content recommendation error: {e}", file=sys.stderr)
+            return None
+    
+    def segment_customer(self, customer_data, mode='behavior'):
+        """Segment customer using ML clustering"""
+        try:
+            model_key = f'segment_{mode}'
+            if model_key not in FEATURES:
+                return None
+            
+            values = tuple(customer_data[f] for f in FEATURES[model_key])
+            segment = self._predict(model_key, values)
+            if segment is None:
+                return None
+            
+            return SEGMENT_PERSONAS.get(segment, f"Segment {segment}")
+        except Exception as e:
+            print(f"Segmentation error: {e}", file=sys.stderr)
+            return None
+    
+    def segment_customers_batch(self, rows, mode='behavior'):
+        """Segment many customers with a single scaler + model call"""
+        if len(rows) == 0:
+            return []
+        try:
+            model_key = f'segment_{mode}'
+            if model_key not in FEATURES:
+                return None
+            
+            entry = self._get(model_key)
+            if entry is None:
+                return None
+            
+            # Stack every row into one (N, F) array instead of predicting row by row
+            features = FEATURES[model_key]
+            X = np.fromiter(
+                (row[f] for row in rows for f in features),
+                dtype=np.float64,
+                count=len(rows) * len(features),
+            ).reshape(len(rows), len(features))
+            
+            X_scaled = self._scale(model_key, entry, X)
+            segments = entry['model'].predict(X_scaled)
+            
+            return [SEGMENT_PERSONAS.get(int(s), f"Segment {s}") for s in segments]
+        except Exception as e:
+            print(f"Segmentation error: {e}", file=sys.stderr)
+            return None
+    
+    def analyze_intent(self, msg_lower):
+        """Analyze an already lowercased user message to determine intent"""
+        for intent, pattern in INTENT_PATTERNS:
+            if pattern.search(msg_lower):
+                return intent
+        
+        # General help
+        return 'general'
+    
+    def generate_response(self, message, context=None):
+        """Generate intelligent response using ML models"""
+        # Lowercase once here; intent matching and every handler use this copy
+        # (replies don't depend on case, so it also makes a better cache key)
+        msg_lower = message.lower()
+        ctx_key = json.dumps(context, sort_keys=True)
+        return self._generate_cached(msg_lower, ctx_key)
+    
+    def _generate_uncached(self, msg_lower, ctx_key):
+        """Route a message to its intent handler (cached by generate_response)"""
+        context = json.loads(ctx_key)
+        intent = self.analyze_intent(msg_lower)
+        
+        if intent == 'performance':
+            return self._handle_performance_query(msg_lower, context)
+        elif intent == 'content':
+            return self._handle_content_query(msg_lower, context)
+        elif intent == 'segmentation':
+            return self._handle_segmentation_query(msg_lower, context)
+        elif intent == 'prediction':
+            return self._handle_prediction_query(msg_lower, context)
+        else:
+            return self._handle_general_query(msg_lower)
+    
+    def _handle_performance_query(self, msg_lower, context):
+        """Handle performance-related queries"""
+        return PERFORMANCE_HELP
+    
+    def _handle_content_query(self, msg_lower, context):
+        """Handle content recommendation queries"""
+        return CONTENT_HELP
+    
+    def _handle_segmentation_query(self, msg_lower, context):
+        """Handle customer segmentation queries"""
+        return SEGMENTATION_HELP
+    
+    def _handle_prediction_query(self, msg_lower, context):
+        """Handle prediction queries"""
+        return PREDICTION_HELP
+    
+    def _handle_general_query(self, msg_lower):
+        """Handle general queries"""
+        for pattern, reply in GENERAL_REPLIES:
+            if pattern.search(msg_lower):
+                return reply
+        
+        return DEFAULT_REPLY
+
+
+# Module-global chatbot so a long-lived process loads the models only once
+chatbot = None
+
+
+def get_chatbot():
+    """Return the shared MLChatbot, creating it on first use"""
+    global chatbot
+    if chatbot is None:
+        chatbot = MLChatbot()
+    return chatbot
+
+
+def _encode_frame(frame):
+    """Encode one frame as a newline-terminated JSON line"""
+    if orjson is not None:
+        return orjson.dumps(frame) + b"\n"
+    return (json.dumps(frame) + "\n").encode("utf-8")
+
+
+def write_frames(frames):
+    """Write several frames with a single write + flush"""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(b"".join(_encode_frame(frame) for frame in frames))
+    sys.stdout.buffer.flush()
+
+
+def stream_response(response):
+    """Write a response as {"word"} frames followed by a {"done"} frame"""
+    # Stream response word by word for real-time effect, but batch the
+    # frames so a long reply costs a handful of writes instead of one per word
+    words = response.split(' ')
+    for start in range(0, len(words), WORDS_PER_WRITE):
+        write_frames({"word": word} for word in words[start:start + WORDS_PER_WRITE])
+    
+    write_frames([{"done": True}])
+
+
+def _handle_sigterm(signum, frame):
+    """Flush any buffered frames and exit cleanly"""
+    sys.stdout.flush()
+    sys.exit(0)
+
+
+def reply_response(response):
+    """Write a whole response as a single {"response"} frame"""
+    write_frames([{"response": response, "done": True}])
+
+
+def serve_stdin(stream=True):
+    """Answer one JSON request {"message", "context"} per stdin line until EOF
+    
+    Replies are streamed as {"word"} frames unless stream is False or the
+    request sets "stream": false, in which case one {"response"} frame is sent.
+    """
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    bot = get_chatbot()
+    # Unpickle everything before reading requests, not during the first reply
+    bot.load_models()
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            request = json.loads(line)
+            message = request["message"]
+            context = request.get("context")
+            streamed = request.get("stream", stream)
+            response = bot.generate_response(message, context)
+        except Exception as e:
+            write_frames([{"error": f"Invalid request: {e}", "done": True}])
+            continue
+        
+        if streamed:
+            stream_response(response)
+        else:
+            reply_response(response)
+
+
+USAGE = """Usage:
+  ml_chatbot.py MESSAGE [CONTEXT_JSON]   answer one message (streamed frames)
+  ml_chatbot.py --serve                  JSON request per stdin line, streamed frames
+  ml_chatbot.py --stdin                  JSON request per stdin line, one {"response"} frame
+"""
+
 
 def main():
     """Main function for streaming responses"""
+    if len(sys.argv) >= 2 and sys.argv[1] in ("-h", "--help"):
+        sys.stdout.write(USAGE)
+        return
+    
+    if len(sys.argv) >= 2 and sys.argv[1] in ("--serve", "--stdin"):
+        # --serve streams words (SSE endpoint); --stdin sends whole replies
+        serve_stdin(stream=sys.argv[1] == "--serve")
+        return
+    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No message provided"}))
         sys.exit(1)
@@ -315,16 +634,8 @@ def main():
     message = sys.argv[1]
     context = json.loads(sys.argv[2]) if len(sys.argv) > 2 else None
     
-    chatbot = MLChatbot()
-    response = chatbot.generate_response(message, context)
-    
-    # Stream response word by word for real-time effect
-    words = response.split(' ')
-    for word in words:
-        print(json.dumps({"word": word}))
-        sys.stdout.flush()
-    
-    print(json.dumps({"done": True}))
+    response = get_chatbot().generate_response(message, context)
+    stream_response(response)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,196 @@
+/**
+ * Python Worker Module
+ * Keeps long-lived Python processes per script and talks to them
+ * over stdin/stdout using newline-delimited JSON.
+ */
+
+const { spawn } = require('child_process');
+
+class PythonWorker {
+  /**
+   * @param {string} command  Python executable
+   * @param {string[]} args   Script path and flags (e.g. [script, '--serve'])
+   * @param {object} options
+   *   isFinal(frame) -> true when a frame completes the current request
+   *   name           label used in log messages
+   *   timeoutMs      kill and respawn the process if one request takes longer
+   */
+  constructor(command, args, options = {}) {
+    this.command = command;
+    this.args = args;
+    this.isFinal = options.isFinal || (() => true);
+    this.name = options.name || 'Python worker';
+    this.timeoutMs = options.timeoutMs || 0;
+    this.proc = null;
+    this.buffer = '';
+    this.stderr = '';
+    this.pending = [];
+    this.timer = null;
+  }
+
+  // Spawn the process on first use (and again after it exits)
+  start() {
+    if (this.proc) return this.proc;
+
+    const proc = spawn(this.command, this.args);
+    this.proc = proc;
+    this.buffer = '';
+    this.stderr = '';
+
+    // Decode as a stream: replies are raw UTF-8, and a multi-byte
+    // character can be split across two pipe chunks
+    proc.stdout.setEncoding('utf8');
+    proc.stderr.setEncoding('utf8');
+
+    proc.stdout.on('data', (data) => {
+      // Late output from a process killed after a timeout is dropped
+      if (this.proc !== proc) return;
+      this.buffer += data;
+      let newline;
+      while ((newline = this.buffer.indexOf('\n')) !== -1) {
+        const line = this.buffer.slice(0, newline).trim();
+        this.buffer = this.buffer.slice(newline + 1);
+        if (line) this._dispatch(line);
+      }
+    });
+
+    proc.stderr.on('data', (data) => {
+      // Ignore warnings, only log critical errors
+      const errMsg = data;
+      if (!errMsg.includes('Warning:') && !errMsg.includes('UserWarning') && !errMsg.includes('FutureWarning')) {
+        this.stderr = (this.stderr + errMsg).slice(-4000);
+        console.error(`${this.name} error:`, errMsg);
+      }
+    });
+
+    const fail = (err) => {
+      if (this.proc !== proc) return;
+      this.proc = null;
+      this._clearTimer();
+      const pending = this.pending;
+      this.pending = [];
+      for (const job of pending) job.reject(err);
+    };
+
+    proc.on('error', (err) => fail(err));
+    proc.stdin.on('error', (err) => fail(err));
+    proc.on('close', (code) => {
+      fail(new Error(this.stderr || `${this.name} exited with code ${code}`));
+    });
+
+    return proc;
+  }
+
+  _dispatch(line) {
+    let frame;
+    try {
+      frame = JSON.parse(line);
+    } catch (e) {
+      // Skip invalid JSON
+      return;
+    }
+
+    const job = this.pending[0];
+    if (!job) return;
+
+    if (job.onFrame) job.onFrame(frame);
+    if (this.isFinal(frame)) {
+      this.pending.shift();
+      this._armTimer();
+      job.resolve(frame);
+    }
+  }
+
+  _clearTimer() {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+  }
+
+  // (Re)start the timeout for the request currently being answered
+  _armTimer() {
+    this._clearTimer();
+    if (!this.timeoutMs || this.pending.length === 0) return;
+    const proc = this.proc;
+    this.timer = setTimeout(() => this._timeout(proc), this.timeoutMs);
+  }
+
+  // The current request hung: fail it, kill the process and resend the
+  // requests queued behind it to a fresh one
+  _timeout(proc) {
+    if (this.proc !== proc) return;
+    this.timer = null;
+    const [job, ...queued] = this.pending;
+    this.pending = [];
+    this.proc = null;
+    proc.kill('SIGKILL');
+    console.error(`${this.name} timed out after ${this.timeoutMs} ms; restarting`);
+    job.reject(new Error(`${this.name} timed out after ${this.timeoutMs} ms`));
+    for (const next of queued) this._send(next);
+  }
+
+  _send(job) {
+    let proc;
+    try {
+      proc = this.start();
+    } catch (err) {
+      return job.reject(err);
+    }
+    this.pending.push(job);
+    if (this.pending.length === 1) this._armTimer();
+    proc.stdin.write(JSON.stringify(job.payload) + '\n');
+  }
+
+  /**
+   * Send one request. Requests are answered in order, so they can be
+   * written straight away and matched to replies FIFO.
+   * Resolves with the final frame; onFrame sees every frame.
+   */
+  request(payload, onFrame) {
+    return new Promise((resolve, reject) => {
+      this._send({ payload, onFrame, resolve, reject });
+    });
+  }
+
+  stop() {
+    this._clearTimer();
+    if (this.proc) {
+      this.proc.kill('SIGTERM');
+      this.proc = null;
+    }
+  }
+}
+
+/**
+ * A few PythonWorkers for the same script; each request goes to the one
+ * with the fewest requests in flight, so one slow request doesn't hold up
+ * the others. Processes are only spawned once they are needed.
+ */
+class PythonWorkerPool {
+  /**
+   * @param {string} command  Python executable
+   * @param {string[]} args   Script path and flags
+   * @param {object} options  PythonWorker options, plus
+   *   size  number of processes (default 2)
+   */
+  constructor(command, args, options = {}) {
+    const size = Math.max(1, options.size || 2);
+    this.name = options.name || 'Python worker';
+    this.workers = [];
+    for (let i = 0; i < size; i++) {
+      this.workers.push(new PythonWorker(command, args, { ...options, name: `${this.name} #${i + 1}` }));
+    }
+  }
+
+  request(payload, onFrame) {
+    const worker = this.workers.reduce((best, w) => (w.pending.length < best.pending.length ? w : best));
+    return worker.request(payload, onFrame);
+  }
+
+  stop() {
+    for (const worker of this.workers) worker.stop();
+  }
+}
+
+module.exports = { PythonWorker, PythonWorkerPool };
@@ -6,7 +6,6 @@ const cors = require("cors");
 const bcrypt = require("bcryptjs");
 const multer = require("multer");
 const path = require("path");
-const { spawn } = require("child_process");
 const { exec } = require("child_process");
 const fs = require("fs");
 require('dotenv').config();
@@ -27,6 +26,9 @@ const {
 // Import email service
 const { sendPasswordResetEmail } = require('./emailService');
 
+// Import persistent Python worker
+const { PythonWorker, PythonWorkerPool } = require('./pythonWorker');
+
 const app = express();
 const PORT = process.env.PORT || 3000;
 const APP_URL = process.env.APP_URL || `http://localhost:${PORT}`;
@@ -74,10 +76,33 @@ function createInsight({ userId, type, title, prompt, details }) {
 
 // ---------- Python runners ----------
 
-// Segmentation runner (ml/segment_customers.py <csvPath> <mode>)
-function runPythonSegmentation(filePath, mode = "behavior") {
+// Scoring processes per script, and how long one CSV may take before its
+// process is killed and respawned
+const ML_POOL_SIZE = Number(process.env.ML_POOL_SIZE) || 2;
+const ML_TIMEOUT_MS = Number(process.env.ML_TIMEOUT_MS) || 5 * 60 * 1000;
+
+// Long-lived scoring processes; each loads its models once and then
+// answers one {"csv", "mode"} JSON line per request
+const segmentationWorker = new PythonWorkerPool(
+  "python3",
+  [path.join(__dirname, "..", "ml", "segment_customers.py"), "--serve"],
+  { name: "Python segmentation", size: ML_POOL_SIZE, timeoutMs: ML_TIMEOUT_MS }
+);
+
+const performanceWorker = new PythonWorkerPool(
+  "python3",
+  [path.join(__dirname, "..", "ml", "score_performance.py"), "--serve"],
+  { name: "Python performance", size: ML_POOL_SIZE, timeoutMs: ML_TIMEOUT_MS }
+);
+
+process.on("exit", () => {
+  segmentationWorker.stop();
+  performanceWorker.stop();
+});
+
+// Send one CSV to a scoring worker; results carrying "error" are rejected
+function runPythonWorker(worker, filePath, mode) {
   return new Promise((resolve, reject) => {
-    const pythonScript = path.join(__dirname, "..", "ml", "segment_customers.py");
     const absFilePath = path.isAbsolute(filePath)
       ? filePath
       : path.join(__dirname, filePath);
@@ -86,69 +111,27 @@ function runPythonSegmentation(filePath, mode = "behavior") {
       return reject(new Error(`Uploaded CSV not found: ${absFilePath}`));
     }
 
-    const pythonProcess = spawn("python3", [pythonScript, absFilePath, mode]);
-    let stdoutData = "";
-    let stderrData = "";
-
-    pythonProcess.stdout.on("data", (chunk) => (stdoutData += chunk.toString()));
-    pythonProcess.stderr.on("data", (chunk) => (stderrData += chunk.toString()));
-
-    pythonProcess.on("close", (code) => {
-      if (code !== 0) {
-        console.error("Python segmentation error:", stderrData);
-        return reject(new Error(stderrData || `Python exited with code ${code}`));
-      }
-      try {
-        const parsed = JSON.parse(stdoutData);
-        resolve(parsed);
-      } catch (err) {
-        console.error("Failed to parse Python output:", err);
-        reject(err);
-      }
-    });
+    worker
+      .request({ csv: absFilePath, mode })
+      .then((result) => {
+        if (result.error) {
+          console.error(`${worker.name} error:`, result.error);
+          return reject(new Error(result.error));
+        }
+        resolve(result);
+      })
+      .catch(reject);
   });
 }
 
-// Performance runner (ml/score_performance.py <csvPath> <mode>)
-function runPythonPerformance(filePath, mode = "roi") {
-  return new Promise((resolve, reject) => {
-    const pythonScript = path.join(__dirname, "..", "ml", "score_performance.py");
-
-    const absFilePath = path.isAbsolute(filePath)
-      ? filePath
-      : path.join(__dirname, filePath);
-
-    if (!fs.existsSync(absFilePath)) {
-      return reject(new Error(`Uploaded CSV not found: ${absFilePath}`));
-    }
-
-    const pythonProcess = spawn("python3", [pythonScript, absFilePath, mode]);
-
-    let stdoutData = "";
-    let stderrData = "";
-
-    pythonProcess.stdout.on("data", (chunk) => {
-      stdoutData += chunk.toString();
-    });
-
-    pythonProcess.stderr.on("data", (chunk) => {
-      stderrData += chunk.toString();
-    });
+// Segmentation runner (ml/segment_customers.py --serve)
+function runPythonSegmentation(filePath, mode = "behavior") {
+  return runPythonWorker(segmentationWorker, filePath, mode);
+}
 
-    pythonProcess.on("close", (code) => {
-      if (code !== 0) {
-        console.error("Python performance error:", stderrData);
-        return reject(new Error(stderrData || `Python exited with code ${code}`));
-      }
-      try {
-        const parsed = JSON.parse(stdoutData);
-        resolve(parsed);
-      } catch (err) {
-        console.error("Failed to parse performance output:", err);
-        reject(err);
-      }
-    });
-  });
+// Performance runner (ml/score_performance.py --serve)
+function runPythonPerformance(filePath, mode = "roi") {
+  return runPythonWorker(performanceWorker, filePath, mode);
 }
 
 // ---------- AUTH ROUTES ----------
@@ -1154,6 +1137,34 @@ function getFallbackChatResponse(message) {
   }
 }
 
+// Single long-lived chatbot process; models are loaded once, not per message
+const chatbotWorker = new PythonWorker(
+  '/Users/bulumkamaseko/Desktop/miniconda3/bin/python',
+  ['-W', 'ignore', path.join(__dirname, 'ml_chatbot.py'), '--serve'],
+  // Replies are canned text plus a few predictions; anything slower is a hang
+  { name: 'ML Chatbot', isFinal: (frame) => frame.done === true, timeoutMs: 30 * 1000 }
+);
+
+process.on('exit', () => chatbotWorker.stop());
+
+// Stream the fallback response word by word over SSE
+function streamFallbackChatResponse(res, message) {
+  const fallback = getFallbackChatResponse(message);
+  const fallbackWords = fallback.split(' ');
+  let index = 0;
+  const interval = setInterval(() => {
+    if (index < fallbackWords.length) {
+      const chunk = index === 0 ? fallbackWords[index] : ' ' + fallbackWords[index];
+      res.write(`data: ${JSON.stringify({ chunk, done: false })}\n\n`);
+      index++;
+    } else {
+      res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
+      res.end();
+      clearInterval(interval);
+    }
+  }, 80);
+}
+
 // Streaming chat endpoint using Server-Sent Events with ML
 app.post("/api/help/chat/stream", async (req, res) => {
   const { message, context } = req.body;
@@ -1164,151 +1175,46 @@ app.post("/api/help/chat/stream", async (req, res) => {
   res.setHeader('Cache-Control', 'no-cache');
   res.setHeader('Connection', 'keep-alive');
 
+  req.on('close', () => {
+    res.end();
+  });
+
+  let words = [];
+
   try {
     // Try ML-powered response first
-    const pythonScript = path.join(__dirname, 'ml_chatbot.py');
-    const args = [pythonScript, message];
-    if (context) {
-      args.push(JSON.stringify(context));
-    }
-    
-    const python = spawn('/Users/bulumkamaseko/Desktop/miniconda3/bin/python', args);
-    let words = [];
-    
-    python.stdout.on('data', (data) => {
-      const lines = data.toString().split('\n');
-      for (const line of lines) {
-        if (!line.trim()) continue;
-        try {
-          const parsed = JSON.parse(line);
-          if (parsed.word) {
-            words.push(parsed.word);
-            res.write(`data: ${JSON.stringify({ chunk: ' ' + parsed.word, done: false })}\n\n`);
-          }
-          if (parsed.done) {
-            res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
-            res.end();
-          }
-        } catch (e) {
-          // Skip invalid JSON
-        }
-      }
-    });
-    
-    python.stderr.on('data', (data) => {
-      // Ignore warnings, only log critical errors
-      const errMsg = data.toString();
-      if (!errMsg.includes('Warning:') && !errMsg.includes('UserWarning') && !errMsg.includes('FutureWarning')) {
-        console.error('ML Chatbot error:', errMsg);
-      }
-    });
-    
-    python.on('close', (code) => {
-      if (code !== 0 && words.length === 0) {
-        // Fallback to simple response if ML fails
-        const fallback = getFallbackChatResponse(message);
-        const fallbackWords = fallback.split(' ');
-        let index = 0;
-        const interval = setInterval(() => {
-          if (index < fallbackWords.length) {
-            const chunk = index === 0 ? fallbackWords[index] : ' ' + fallbackWords[index];
-            res.write(`data: ${JSON.stringify({ chunk, done: false })}\n\n`);
-            index++;
-          } else {
-            res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
-            res.end();
-            clearInterval(interval);
-          }
-        }, 80);
+    await chatbotWorker.request({ message, context: context || null }, (frame) => {
+      if (frame.word) {
+        words.push(frame.word);
+        res.write(`data: ${JSON.stringify({ chunk: ' ' + frame.word, done: false })}\n\n`);
       }
     });
-    
-    python.on('error', (err) => {
-      console.error('Failed to start Python:', err);
-      // Fallback response
-      const fallback = getFallbackChatResponse(message);
-      const fallbackWords = fallback.split(' ');
-      let index = 0;
-      const interval = setInterval(() => {
-        if (index < fallbackWords.length) {
-          const chunk = index === 0 ? fallbackWords[index] : ' ' + fallbackWords[index];
-          res.write(`data: ${JSON.stringify({ chunk, done: false })}\n\n`);
-          index++;
-        } else {
-          res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
-          res.end();
-          clearInterval(interval);
-        }
-      }, 80);
-    });
-
+    if (words.length === 0) {
+      // Fallback to simple response if ML returned nothing
+      return streamFallbackChatResponse(res, message);
+    }
+    res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
+    res.end();
   } catch (err) {
     console.error('Chat error:', err);
-    const fallback = getFallbackChatResponse(message);
-    res.write(`data: ${JSON.stringify({ chunk: fallback, done: true })}\n\n`);
+    if (words.length === 0) {
+      return streamFallbackChatResponse(res, message);
+    }
+    res.write(`data: ${JSON.stringify({ chunk: '', done: true })}\n\n`);
     res.end();
   }
-
-  req.on('close', () => {
-    res.end();
-  });
 });
 
 // Legacy non-streaming endpoint (kept for compatibility - now ML-powered)
 app.post("/api/help/chat", async (req, res) => {
   const { message, context } = req.body;
   if (!message) return res.status(400).json({ error: 'No message' });
-  
+
   try {
     // Try ML-powered response
-    const pythonScript = path.join(__dirname, 'ml_chatbot.py');
-    const args = [pythonScript, message];
-    if (context) {
-      args.push(JSON.stringify(context));
-    }
-    
-    const python = spawn('/Users/bulumkamaseko/Desktop/miniconda3/bin/python', args);
-    let response = '';
-    let error = '';
-    
-    python.stdout.on('data', (data) => {
-      response += data.toString();
-    });
-    
-    python.stderr.on('data', (data) => {
-      // Ignore warnings, only log critical errors
-      const errMsg = data.toString();
-      if (!errMsg.includes('Warning:') && !errMsg.includes('UserWarning') && !errMsg.includes('FutureWarning')) {
-        error += errMsg;
-      }
-    });
-    
-    python.on('close', (code) => {
-      if (code !== 0) {
-        console.error('ML Chatbot error:', error);
-        return res.json({ reply: getFallbackChatResponse(message) });
-      }
-      
-      // Parse the full response
-      const lines = response.trim().split('\n');
-      const words = [];
-      for (const line of lines) {
-        try {
-          const parsed = JSON.parse(line);
-          if (parsed.word) words.push(parsed.word);
-          if (parsed.done) break;
-        } catch (e) {
-          // Skip invalid JSON lines
-        }
-      }
-      res.json({ reply: words.join(' ') });
-    });
-    
-    python.on('error', (err) => {
-      console.error('Failed to start Python:', err);
-      res.json({ reply: getFallbackChatResponse(message) });
-    });
-    
+    // Ask for the whole reply in one frame instead of word-by-word
+    const frame = await chatbotWorker.request({ message, context: context || null, stream: false });
+    res.json({ reply: frame.response || getFallbackChatResponse(message) });
   } catch (err) {
     console.error('Chat error:', err);
     res.json({ reply: getFallbackChatResponse(message) });
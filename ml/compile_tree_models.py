@@ -0,0 +1,80 @@
+# ===============================================
+# compile_tree_models.py
+# Compiles the tree-ensemble models in ml/models (RandomForest / gradient
+# boosting) into native shared libraries with Treelite + TL2cgen, so the
+# chatbot can score them without going through sklearn.
+# train_advanced_performance_models.py compiles its models itself; re-run
+# this after train_content_model.py.
+# Usage:
+#   python3 ml/compile_tree_models.py
+# Requires:
+#   pip install treelite tl2cgen   (and a C compiler, e.g. gcc)
+# ===============================================
+import os
+import sys
+import treelite
+import tl2cgen
+from model_utils import lib_info_path, load_estimator, write_lib_info
+
+# Tree-based models only; the KMeans segmentation models have no trees to compile
+MODEL_FILES = [
+    "content_model.pkl",
+    "perf_engagement_model.pkl",
+    "perf_conversion_model.pkl",
+    "perf_roi_model.pkl",
+]
+
+
+def compile_estimator(model, lib_path, parallel_comp=os.cpu_count() or 1):
+    """Compile a fitted sklearn tree ensemble to the shared library lib_path.
+
+    Also writes <lib_path>.json with the input dtype the model expects.
+    """
+    # Drop the old description first, so a failed compile can't leave it
+    # pointing at a library built from a different model
+    if os.path.exists(lib_info_path(lib_path)):
+        os.remove(lib_info_path(lib_path))
+    tl_model = treelite.sklearn.import_model(model)
+    tl2cgen.export_lib(
+        tl_model,
+        toolchain="gcc",
+        libpath=lib_path,
+        params={"parallel_comp": parallel_comp},
+    )
+    write_lib_info(lib_path, model)
+    return lib_path
+
+
+def compile_model(model_path, parallel_comp=os.cpu_count() or 1):
+    """Write <model>.so next to <model>.pkl and return its path."""
+    model = load_estimator(model_path)
+    lib_path = os.path.splitext(model_path)[0] + ".so"
+    return compile_estimator(model, lib_path, parallel_comp)
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    models_dir = os.path.join(base_dir, "models")
+
+    compiled = 0
+    for name in MODEL_FILES:
+        model_path = os.path.join(models_dir, name)
+        pipeline_path = model_path[: -len("_model.pkl")] + "_pipeline.pkl"
+        if not os.path.exists(model_path) and not os.path.exists(pipeline_path):
+            print(f"Skipping {name}: not found")
+            continue
+        try:
+            lib_path = compile_model(model_path)
+        except Exception as e:
+            print(f"Failed to compile {name}: {e}")
+            continue
+        print(f"✅ Saved {lib_path}")
+        compiled += 1
+
+    if compiled == 0:
+        print("ERROR: No models compiled. Train the models first.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# ===============================================
+# convert_models.py
+# Converts the trained sklearn models in ml/models to ONNX so the chatbot
+# can run them with onnxruntime. Re-run after any of the train_* scripts.
+# Usage:
+#   python3 ml/convert_models.py
+# Requires:
+#   pip install skl2onnx onnxruntime
+# ===============================================
+import os
+import sys
+from model_utils import load_estimator
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+# Models (not scalers) that the chatbot loads
+MODEL_FILES = [
+    "content_model.pkl",
+    "perf_engagement_model.pkl",
+    "perf_conversion_model.pkl",
+    "perf_roi_model.pkl",
+    "segmentation_model.pkl",
+    "campaign_segmentation_model.pkl",
+    "engagement_segmentation_model.pkl",
+]
+
+
+def convert(model_path):
+    """Write <model>.onnx next to <model>.pkl and return its path."""
+    model = load_estimator(model_path)
+    n_features = model.n_features_in_
+
+    onnx_model = convert_sklearn(
+        model, initial_types=[("X", FloatTensorType([None, n_features]))]
+    )
+
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    with open(onnx_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    return onnx_path
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    models_dir = os.path.join(base_dir, "models")
+
+    converted = 0
+    for name in MODEL_FILES:
+        model_path = os.path.join(models_dir, name)
+        pipeline_path = model_path[: -len("_model.pkl")] + "_pipeline.pkl"
+        if not os.path.exists(model_path) and not os.path.exists(pipeline_path):
+            print(f"Skipping {name}: not found")
+            continue
+        try:
+            onnx_path = convert(model_path)
+        except Exception as e:
+            print(f"Failed to convert {name}: {e}")
+            continue
+        print(f"✅ Saved {onnx_path}")
+        converted += 1
+
+    if converted == 0:
+        print("ERROR: No models converted. Train the models first.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# ===============================================
+# csv_utils.py
+# CSV loading shared by the ml/ scoring scripts.
+# ===============================================
+import os
+import pandas as pd
+
+# Files at least this big are streamed in chunks instead of read at once
+STREAM_MIN_BYTES = 64 * 1024 * 1024
+
+# Rows per chunk when streaming
+CHUNK_ROWS = 100_000
+
+
+def read_csv(data_path: str, columns):
+    """Read just the wanted columns, using the multithreaded pyarrow parser if available."""
+    # pyarrow needs an explicit column list, so keep only the ones the file has
+    header = pd.read_csv(data_path, nrows=0).columns
+    usecols = [c for c in header if c in columns]
+    try:
+        return pd.read_csv(data_path, engine="pyarrow", usecols=usecols)
+    except ImportError:
+        return pd.read_csv(data_path, usecols=usecols)
+
+
+class CSVReadError(Exception):
+    """The CSV could not be opened or parsed."""
+
+
+def iter_csv(data_path: str, columns, chunksize: int = CHUNK_ROWS):
+    """Yield the wanted columns as DataFrames; large files come in chunks of chunksize rows.
+
+    Any error reading or parsing the file, including one hit mid-stream,
+    is raised as CSVReadError.
+    """
+    try:
+        yield from _iter_chunks(data_path, columns, chunksize)
+    except Exception as e:
+        raise CSVReadError(str(e)) from e
+
+
+def _iter_chunks(data_path: str, columns, chunksize: int):
+    if os.path.getsize(data_path) < STREAM_MIN_BYTES:
+        # Typical uploads: one multithreaded read
+        yield read_csv(data_path, columns)
+        return
+
+    # The pyarrow engine can't stream, so large files use the C parser
+    header = pd.read_csv(data_path, nrows=0).columns
+    usecols = [c for c in header if c in columns]
+    yield from pd.read_csv(data_path, usecols=usecols, chunksize=chunksize)
@@ -0,0 +1,220 @@
+# ===============================================
+# model_utils.py
+# Model loading, scaling and serving helpers shared by the ml/ scoring
+# scripts, the export tools and backend/ml_chatbot.py.
+# Convention here and in the scripts that use it: numpy / pandas / joblib
+# (and sklearn, via unpickling) are imported inside the functions that need
+# them, and optional packages are detected with importlib.util.find_spec
+# rather than imported, so startup and argument / file errors stay fast.
+# ===============================================
+import json
+import os
+import sys
+
+try:
+    import orjson  # optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
+# Memory-map model arrays from the page cache instead of copying them into
+# each process. Windows keeps mapped files locked, so load normally there.
+MMAP_MODE = None if os.name == "nt" else "r"
+
+
+def to_json(result, allow_nan=True, indent=False) -> str:
+    """Serialize result (compactly, or 2-space indented), via orjson when it is installed."""
+    if orjson is None:
+        return json.dumps(result, allow_nan=allow_nan, indent=2 if indent else None)
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    # orjson writes NaN/Infinity as null, so its output is always valid JSON
+    return orjson.dumps(result, option=option).decode()
+
+
+def load_pickle(path, mmap_mode=MMAP_MODE):
+    """joblib.load with the arrays memory-mapped where supported."""
+    import joblib
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def newest_mtime(paths) -> float:
+    """Newest mtime among the files in paths that exist (0.0 if none do)."""
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+def cached_by_mtime(cache, key, mtime, load):
+    """Return load() for key, calling it again only when mtime changes.
+
+    Only the newest result per key is kept, so a long-lived worker doesn't
+    hold on to every model set it has seen retrained.
+    """
+    entry = cache.get(key)
+    if entry is None or entry[0] != mtime:
+        # Drop the old models before loading their replacement
+        cache.pop(key, None)
+        entry = (mtime, load())
+        cache[key] = entry
+    return entry[1]
+
+
+def pipeline_input_dtype(pipeline):
+    """dtype a saved Pipeline's "cast" step converts its input to, or None if it has none."""
+    import numpy as np
+    cast = pipeline.named_steps.get("cast")
+    return None if cast is None else np.dtype(cast.kw_args["dtype"])
+
+
+def load_scaler_and_model(pipeline_path, scaler_path, model_path):
+    """(scaler, model, input_dtype) from <prefix>_pipeline.pkl, else from the separate pickles.
+
+    input_dtype is what the pipeline casts features to before scaling
+    (None for the separate pickles). Returns None when neither is on disk.
+    """
+    if os.path.exists(pipeline_path):
+        # Current trainers save scaler + model as one Pipeline file
+        pipeline = load_pickle(pipeline_path)
+        return pipeline.named_steps["scaler"], pipeline.named_steps["model"], pipeline_input_dtype(pipeline)
+    if os.path.exists(scaler_path) and os.path.exists(model_path):
+        return load_pickle(scaler_path), load_pickle(model_path), None
+    return None
+
+
+def load_estimator(model_path):
+    """Load <prefix>_model.pkl, or the model step of <prefix>_pipeline.pkl if present."""
+    # Read into memory: the exporters copy every array anyway, and unaligned
+    # memory-mapped arrays from old pickles are not safe to hand to C code
+    stem = os.path.splitext(model_path)[0]
+    if stem.endswith("_model"):
+        pipeline_path = stem[: -len("_model")] + "_pipeline.pkl"
+        if os.path.exists(pipeline_path):
+            return load_pickle(pipeline_path, mmap_mode=None).named_steps["model"]
+    return load_pickle(model_path, mmap_mode=None)
+
+
+def scaler_params(scaler, n_features, dtype=None):
+    """(mean, scale) arrays of a fitted StandardScaler, in the dtype its input has.
+
+    StandardScaler.transform is just (x - mean_) / scale_ computed in the
+    input's dtype, so keeping these lets predictors skip sklearn's per-call
+    validation and copies. dtype is the pipeline's input_dtype (float32 for
+    the float32 trainers); by default float64, as for the legacy pickles.
+    """
+    import numpy as np
+    mean = getattr(scaler, "mean_", None)
+    if dtype is None:
+        dtype = np.float32 if mean is not None and mean.dtype == np.float32 else np.float64
+    mean = np.zeros(n_features, dtype=dtype) if mean is None else np.asarray(mean, dtype=dtype)
+    scale = getattr(scaler, "scale_", None)
+    scale = np.ones(n_features, dtype=dtype) if scale is None else np.asarray(scale, dtype=dtype)
+    return mean, scale
+
+
+def standardize(X, scaling, out=None):
+    """(X - mean) / scale computed in the dtype of scaling, as StandardScaler.transform does.
+
+    X is converted to that dtype first; out, if given, must already have it.
+    Returns out, or a new array when out is None.
+    """
+    import numpy as np
+    mean, scale = scaling
+    if out is None:
+        out = np.array(X, dtype=mean.dtype)
+    else:
+        out[...] = X
+    np.subtract(out, mean, out=out)
+    # Divide rather than multiply by 1/scale so results match transform() bit for bit
+    np.divide(out, scale, out=out)
+    return out
+
+
+def is_fresh(export_path, *source_paths):
+    """True if export_path exists and is at least as new as every existing source file.
+
+    An ONNX / compiled export older than its pickle was made from a previous
+    training run and must not be paired with the new scaler.
+    """
+    try:
+        mtime = os.path.getmtime(export_path)
+    except OSError:
+        return False
+    return all(mtime >= os.path.getmtime(p) for p in source_paths if os.path.exists(p))
+
+
+def predict_dtype(model):
+    """dtype a model compares features in.
+
+    float32 for sklearn forests / gradient boosting (their trees split in
+    float32), else float64 (HistGradientBoosting). Compiled libraries
+    report the dtype recorded for the model they were built from.
+    """
+    import numpy as np
+    if hasattr(model, "input_dtype"):
+        return model.input_dtype
+    return np.float32 if hasattr(model, "estimators_") else np.float64
+
+
+def lib_info_path(lib_path):
+    """Path of the <lib>.json that describes a compiled library."""
+    return lib_path + ".json"
+
+
+def write_lib_info(lib_path, model):
+    """Record which model a compiled library came from and the dtype it expects."""
+    import numpy as np
+    info = {"model": type(model).__name__, "input_dtype": np.dtype(predict_dtype(model)).name}
+    with open(lib_info_path(lib_path), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+class TreeliteModel:
+    """sklearn-style predict() over a Treelite-compiled shared library.
+
+    Needs the <lib>.json written by write_lib_info: the library itself
+    can't tell whether its source model split features in float32.
+    """
+
+    def __init__(self, path):
+        import numpy as np
+        import tl2cgen
+        with open(lib_info_path(path), "r", encoding="utf-8") as f:
+            self.input_dtype = np.dtype(json.load(f)["input_dtype"])
+        self._dmatrix = tl2cgen.DMatrix
+        self.predictor = tl2cgen.Predictor(path)
+
+    def predict(self, X):
+        import numpy as np
+        # Round inputs as the sklearn model would (float32 for forests) so
+        # values next to a threshold fall on the same side.
+        # Output is (rows, targets, classes); regressors have one of each
+        return self.predictor.predict(self._dmatrix(np.asarray(X, dtype=self.input_dtype))).ravel()
+
+
+def serve_requests(score, load, modes, default_mode):
+    """Answer one JSON request {"csv", "mode"} per stdin line until EOF.
+
+    score(csv, mode) returns (JSON text, ok), as result_cache.cached_json does.
+
+    load(mode) is called for every mode first, so the first request is as
+    fast as the rest. A mode that fails to load is skipped here; its
+    requests get the error from score() instead of taking the worker down.
+    """
+    for mode in modes:
+        try:
+            load(mode)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not preload '{mode}' model: {e}", file=sys.stderr)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            reply, _ = score(request["csv"], request.get("mode", default_mode))
+        except Exception as e:
+            reply = json.dumps({"error": f"Invalid request: {e}"})
+        sys.stdout.write(reply + "\n")
+        sys.stdout.flush()
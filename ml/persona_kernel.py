@@ -0,0 +1,34 @@
+# ===============================================
+# persona_kernel.py
+# Numba-compiled persona scoring for segment_customers.py. Only imported
+# when numba is installed and there are enough clusters for the compiled
+# loop to beat NumPy's per-call overhead.
+# ===============================================
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def score_kernel(M):
+    """(K, 5) cluster averages in SCORE_COLS order -> (K, 3) persona scores."""
+    k, n = M.shape
+    lo = np.empty(n)
+    hi = np.empty(n)
+    for j in range(n):
+        lo[j] = M[:, j].min()
+        hi[j] = M[:, j].max()
+
+    # Min–max normalize each column; constant columns become 0.5
+    N = np.empty_like(M)
+    for j in range(n):
+        r = hi[j] - lo[j]
+        for i in range(k):
+            N[i, j] = 0.5 if r == 0 else (M[i, j] - lo[j]) / r
+
+    # Columns: eco_lux, aspiring, gift (same formulas as segment_customers.py)
+    S = np.empty((k, 3))
+    for i in range(k):
+        S[i, 0] = (N[i, 0] + N[i, 1] + N[i, 2]) / 3.0
+        S[i, 1] = (N[i, 3] + N[i, 4]) / 2.0
+        S[i, 2] = ((1 - N[i, 2]) + (1 - N[i, 3]) + N[i, 0]) / 3.0
+    return S
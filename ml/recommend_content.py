@@ -1,19 +1,44 @@
-import pandas as pd
-import pickle
+import numpy as np
 import sys
 import json
 import os
+import warnings
+from csv_utils import read_csv
+from model_utils import load_pickle, to_json
 
 # Always resolve paths relative to this file, no matter where Python is called from
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "models", "content_model.pkl")
 
+# Loaded model, kept for the life of the process
+_MODEL_CACHE = {}
+
+# These are the numeric columns we actually have in content_train.csv
+FEATURE_COLS = [
+    "avg_engagement_rate",
+    "avg_conversion_rate",
+    "avg_roas",
+    "sample_size",
+]
+
+# Descriptive columns echoed back to the UI
+DISPLAY_COLS = ["content_id", "persona_key", "campaign_goal", "channel", "format"]
+
+# Rows returned in the UI table
+TABLE_SIZE = 25
+
+
+def _get_model():
+    """Load the content model once per process and reuse it afterwards."""
+    if "model" not in _MODEL_CACHE:
+        _MODEL_CACHE["model"] = load_pickle(MODEL_PATH)
+    return _MODEL_CACHE["model"]
+
 
 def recommend_content(data_path: str):
     # Load the trained model
     try:
-        with open(MODEL_PATH, "rb") as f:
-            model = pickle.load(f)
+        model = _get_model()
     except FileNotFoundError:
         return {
             "error": f"Model file not found at {MODEL_PATH}",
@@ -32,43 +57,50 @@ def recommend_content(data_path: str):
         return {"error": f"Failed to load model: {e}"}
 
     try:
-        df = pd.read_csv(data_path)
+        df = read_csv(data_path, FEATURE_COLS + DISPLAY_COLS)
     except Exception as e:
         return {"error": f"Unable to read CSV file: {e}"}
 
-    # These are the numeric columns we actually have in content_train.csv
-    feature_cols = [
-        "avg_engagement_rate",
-        "avg_conversion_rate",
-        "avg_roas",
-        "sample_size",
-    ]
-
     # Safety check
-    missing = [c for c in feature_cols if c not in df.columns]
+    missing = [c for c in FEATURE_COLS if c not in df.columns]
     if missing:
         return {"error": f"Missing expected columns in data: {missing}"}
 
-    X = df[feature_cols]
-
-    # Predict an overall performance / priority score
-    df["predicted_score"] = model.predict(X)
+    # Plain float64 ndarray (what the model was fit on) skips sklearn's DataFrame checks
+    X = df[FEATURE_COLS].to_numpy(dtype=np.float64)
 
-    # Sort best → worst
-    df_sorted = df.sort_values(by="predicted_score", ascending=False).reset_index(drop=True)
+    # Predict an overall performance / priority score. Older pickles were fitted
+    # on a DataFrame and warn about the missing feature names on every call;
+    # the columns are already in training order, so that warning is moot
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        scores = model.predict(X)
+    df["predicted_score"] = scores
 
-    # Top 5 recommendations (high-level)
-    top_picks = df_sorted.head(5)[
-        ["persona_key", "campaign_goal", "channel", "format", "predicted_score"]
-    ].to_dict(orient="records")
+    # Only the first TABLE_SIZE rows are ever shown, so pick them with an
+    # O(N) partition and sort just those best → worst
+    k = min(TABLE_SIZE, len(scores))
+    if k < len(scores):
+        top_idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top_idx = np.arange(len(scores))
+    top_idx = top_idx[np.argsort(-scores[top_idx], kind="stable")]
+    df_top = df.iloc[top_idx].reset_index(drop=True)
 
     # Table for UI (first 25 rows)
-    table_display = df_sorted.head(25)[
+    table_display = df_top[
         ["content_id", "persona_key", "campaign_goal", "channel", "format", "predicted_score"]
     ].to_dict(orient="records")
 
+    # Top 5 recommendations (high-level), taken from the table records
+    # rather than converting the DataFrame a second time
+    top_picks = [
+        {k: row[k] for k in ("persona_key", "campaign_goal", "channel", "format", "predicted_score")}
+        for row in table_display[:5]
+    ]
+
     return {
-        "total_items": int(len(df_sorted)),
+        "total_items": int(len(df)),
         "top_recommendations": top_picks,
         "table": table_display,
     }
@@ -81,4 +113,4 @@ if __name__ == "__main__":
 
     data_path = sys.argv[1]
     results = recommend_content(data_path)
-    print(json.dumps(results, indent=2))
+    print(to_json(results, indent=True))
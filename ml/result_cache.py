@@ -0,0 +1,104 @@
+# ===============================================
+# result_cache.py
+# On-disk cache of scoring results, keyed by the CSV's content hash, the
+# mode and the model files' mtime, so re-scoring an unchanged upload is a
+# file read. Used by score_performance.py and segment_customers.py.
+# ===============================================
+import hashlib
+import os
+import tempfile
+from model_utils import to_json
+
+try:
+    import blake3  # optional, faster hashing
+except ImportError:
+    blake3 = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+
+# Oldest results (by last access) are removed beyond this many files
+MAX_ENTRIES = 256
+
+READ_CHUNK = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """Hex digest of the file's bytes (BLAKE3 if installed, else BLAKE2b)."""
+    h = blake3.blake3() if blake3 is not None else hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(scorer: str, csv_path: str, mode: str, model_mtime: float) -> str:
+    """File-name-safe key for one (scorer, CSV content, mode, model version)."""
+    return f"{scorer}-{mode}-{file_digest(csv_path)}-{int(model_mtime * 1e6)}"
+
+
+def cached_json(scorer: str, csv_path: str, mode: str, model_mtime: float, compute):
+    """Return (JSON text, ok) for compute(), reusing the stored text when possible.
+
+    compute() returns the result dict. Results with an "error" key come
+    back with ok False and are not stored. A CSV that can't be hashed is
+    left for compute() to report.
+    """
+    try:
+        key = cache_key(scorer, csv_path, mode, model_mtime)
+    except OSError:
+        key = None
+    else:
+        text = load(key)
+        if text is not None:
+            return text, True
+
+    result = compute()
+    ok = "error" not in result
+    # NaN/Infinity are not valid JSON for the Node side
+    text = to_json(result, allow_nan=False)
+    if ok and key is not None:
+        store(key, text)
+    return text, ok
+
+
+def load(key: str):
+    """Return the cached JSON text for key, or None."""
+    path = os.path.join(CACHE_DIR, key + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        # Mark as recently used; atime alone is unreliable on relatime/noatime mounts
+        os.utime(path)
+    except OSError:
+        return None
+    return text
+
+
+def store(key: str, text: str):
+    """Atomically write text under key, then trim the cache to MAX_ENTRIES."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(CACHE_DIR, key + ".json"))
+        _evict()
+    except OSError:
+        # Caching is best-effort; scoring never fails because of it
+        pass
+
+
+def _evict():
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".json"):
+            entries.append((entry.stat().st_atime, entry.path))
+    if len(entries) <= MAX_ENTRIES:
+        return
+    entries.sort()
+    for _, path in entries[: len(entries) - MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
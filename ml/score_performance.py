@@ -4,8 +4,24 @@
 import sys
 import os
 import json
-import pandas as pd
-import joblib
+import heapq
+import importlib.util
+import result_cache
+from model_utils import (
+    TreeliteModel,
+    cached_by_mtime,
+    is_fresh,
+    load_scaler_and_model,
+    newest_mtime,
+    predict_dtype,
+    scaler_params,
+    serve_requests,
+    standardize,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HAS_TL2CGEN = importlib.util.find_spec("tl2cgen") is not None
 
 FEATURES = [
     "impressions", "clicks", "spend",
@@ -13,6 +29,14 @@ FEATURES = [
     "avg_session_duration",
 ]
 
+MODES = ("engagement", "roi", "conversion")
+
+# Suggestion shown next to each top recommendation
+SUGGESTION = "Prioritise this campaign based on the selected performance mode."
+
+# (mode, base_dir) -> (model files' mtime, loaded model), see load_model
+_MODEL_CACHE = {}
+
 
 def error(msg, code=1):
     print(json.dumps({"error": msg}))
@@ -20,10 +44,13 @@ def error(msg, code=1):
 
 
 def safe_div(num, den):
-    return float(num) / float(den) if den not in (0, 0.0) else 0.0
+    """Element-wise num / den, with 0.0 wherever den is 0."""
+    import numpy as np
+    return np.divide(num, den, out=np.zeros_like(num), where=den != 0)
 
 
-def load_model(mode: str, base_dir: str):
+def model_paths(mode: str, base_dir: str):
+    """Return (metric_name, pipeline_path, model_path, scaler_path, lib_path) for mode."""
     if mode == "engagement":
         prefix = "perf_engagement"
         metric_name = "Predicted Engagement (CTR)"
@@ -34,90 +61,129 @@ def load_model(mode: str, base_dir: str):
         prefix = "perf_roi"
         metric_name = "Predicted ROAS"
 
+    pipeline_path = os.path.join(base_dir, "models", f"{prefix}_pipeline.pkl")
     model_path = os.path.join(base_dir, "models", f"{prefix}_model.pkl")
     scaler_path = os.path.join(base_dir, "models", f"{prefix}_scaler.pkl")
+    lib_path = os.path.join(base_dir, "models", f"{prefix}_model.so")
+    return metric_name, pipeline_path, model_path, scaler_path, lib_path
 
-    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-        error(f"Model or scaler not found for mode '{mode}'. Please run: python ml/train_advanced_performance_models.py")
-
-    try:
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-    except (ValueError, TypeError) as e:
-        error_msg = str(e)
-        if "incompatible dtype" in error_msg or "missing_go_to_left" in error_msg:
-            error(f"Model incompatible with current scikit-learn version. Please retrain: python ml/train_advanced_performance_models.py")
-        error(f"Failed to load model: {error_msg}")
-    
-    return model, scaler, metric_name
 
+def model_mtime(mode: str, base_dir: str) -> float:
+    """Newest mtime among the model files for mode (0.0 if none exist)."""
+    return newest_mtime(model_paths(mode, base_dir)[1:])
 
-def main():
-    if len(sys.argv) < 2:
-        error("No CSV path provided")
 
-    csv_path = sys.argv[1]
-    mode = sys.argv[2].lower() if len(sys.argv) >= 3 else "roi"
-    if mode not in ("engagement", "roi", "conversion"):
-        mode = "roi"
+def load_model(mode: str, base_dir: str = BASE_DIR):
+    """Return (model, (mean, scale), metric_name), reusing the loaded files until they change on disk."""
+    return cached_by_mtime(
+        _MODEL_CACHE, (mode, base_dir), model_mtime(mode, base_dir), lambda: _load_model(mode, base_dir)
+    )
 
-    if not os.path.exists(csv_path):
-        error(f"File not found: {csv_path}")
 
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    model, scaler, metric_name = load_model(mode, base_dir)
+def _load_model(mode: str, base_dir: str):
+    metric_name, pipeline_path, model_path, scaler_path, lib_path = model_paths(mode, base_dir)
 
-    # ---- load data ----
     try:
-        df = pd.read_csv(csv_path)
+        loaded = load_scaler_and_model(pipeline_path, scaler_path, model_path)
+    except (ValueError, TypeError) as e:
+        error_msg = str(e)
+        if "incompatible dtype" in error_msg or "missing_go_to_left" in error_msg:
+            raise RuntimeError(f"Model incompatible with current scikit-learn version. Please retrain: python ml/train_advanced_performance_models.py")
+        raise RuntimeError(f"Failed to load model: {error_msg}")
     except Exception as e:
-        error(f"Failed to read CSV: {e}")
+        # Truncated / corrupt pickles fail with EOFError, UnpicklingError, ...
+        raise RuntimeError(f"Failed to load model: {e}")
+    if loaded is None:
+        raise FileNotFoundError(f"Model or scaler not found for mode '{mode}'. Please run: python ml/train_advanced_performance_models.py")
+    scaler, model, input_dtype = loaded
+
+    # Prefer the compiled library written by the trainer / compile_tree_models.py,
+    # unless it predates the pickles (compiled from an earlier training run)
+    if HAS_TL2CGEN and is_fresh(lib_path, pipeline_path, model_path):
+        try:
+            model = TreeliteModel(lib_path)
+        except Exception as e:
+            print(f"Warning: could not load {lib_path}, using the pickle: {e}", file=sys.stderr)
 
-    missing = [c for c in FEATURES if c not in df.columns]
-    if missing:
-        error(f"Missing columns: {', '.join(missing)}")
+    return model, scaler_params(scaler, len(FEATURES), input_dtype), metric_name
 
-    X = df[FEATURES]
+
+def score_chunk(df, offset, model, scaling):
+    """Rounded per-campaign scores for one chunk of rows starting at row offset."""
+    import numpy as np
+    import pandas as pd
     try:
-        X_scaled = scaler.transform(X)
+        # Fresh array in the precision used during training, scaled in place
+        X = standardize(df[FEATURES], scaling)
+        # Hand the model the C-contiguous block in the dtype it predicts on
+        # so predict() doesn't have to convert it again
+        X_scaled = np.ascontiguousarray(X, dtype=predict_dtype(model))
     except Exception as e:
-        error(f"Scaling failed: {e}")
+        raise RuntimeError(f"Scaling failed: {e}")
 
     try:
         pred = model.predict(X_scaled)
     except Exception as e:
-        error(f"Model prediction failed: {e}")
+        raise RuntimeError(f"Model prediction failed: {e}")
 
     # campaign ids
-    campaign_ids = (
-        df["campaign_id"].astype(str)
-        if "campaign_id" in df.columns
-        else pd.Series(range(len(df))).astype(str)
-    )
+    if "campaign_id" not in df.columns:
+        campaign_ids = np.arange(offset, offset + len(df)).astype(str)
+    else:
+        col = df["campaign_id"]
+        # Text columns are used as-is; only numeric (or NaN-holding) ids
+        # need converting to str
+        if pd.api.types.is_string_dtype(col.dtype) and not col.hasnans:
+            campaign_ids = col.to_numpy(dtype=object, copy=False)
+        else:
+            campaign_ids = col.astype(str).to_numpy()
 
     # ---- derived actual metrics ----
-    ctr_vals = [safe_div(c, i) for c, i in zip(df["clicks"], df["impressions"])]
-    conv_rate_vals = [
-        safe_div(conv, clk) for conv, clk in zip(df["conversions"], df["clicks"])
-    ]
-    cpc_vals = [safe_div(sp, clk) for sp, clk in zip(df["spend"], df["clicks"])]
+    impressions = df["impressions"].to_numpy(dtype=np.float64)
+    clicks = df["clicks"].to_numpy(dtype=np.float64)
+    conversions = df["conversions"].to_numpy(dtype=np.float64)
+    spend = df["spend"].to_numpy(dtype=np.float64)
+
+    scores = pd.DataFrame(
+        {
+            "campaign_id": campaign_ids,
+            # new generic name
+            "pred_score": np.asarray(pred, dtype=np.float64),
+            "ctr": safe_div(clicks, impressions),
+            "conversion_rate": safe_div(conversions, clicks),
+            "cpc": safe_div(spend, clicks),
+        }
+    ).round(4)
+    # backwards-compatible field that your UI expects
+    scores.insert(2, "pred_roas", scores["pred_score"])
+    return scores
 
-    predictions = []
-    for cid, score, ctr, cr, cpc in zip(
-        campaign_ids, pred, ctr_vals, conv_rate_vals, cpc_vals
-    ):
-        predictions.append(
-            {
-                "campaign_id": str(cid),
-                # new generic name
-                "pred_score": round(float(score), 4),
-                # backwards-compatible field that your UI expects
-                "pred_roas": round(float(score), 4),
-                "ctr": round(float(ctr), 4),
-                "conversion_rate": round(float(cr), 4),
-                "cpc": round(float(cpc), 4),
-            }
-        )
+
+def normalize_mode(mode):
+    """Lowercased mode, or "roi" if it isn't one of MODES."""
+    mode = mode.lower() if mode else "roi"
+    return mode if mode in MODES else "roi"
+
+
+def score_performance_json(csv_path: str, mode: str = "roi"):
+    """score_performance() as (JSON text, ok); the same CSV bytes + mode + model files is a cache read."""
+    mode = normalize_mode(mode)
+    return result_cache.cached_json(
+        "performance", csv_path, mode, model_mtime(mode, BASE_DIR), lambda: score_performance(csv_path, mode)
+    )
+
+
+def score_performance(csv_path: str, mode: str = "roi"):
+    """Score every campaign in csv_path; returns the result dict or {"error": ...}."""
+    mode = normalize_mode(mode)
+
+    if not os.path.exists(csv_path):
+        return {"error": f"File not found: {csv_path}"}
+
+    try:
+        model, scaling, metric_name = load_model(mode)
+    except (FileNotFoundError, RuntimeError) as e:
+        return {"error": str(e)}
 
     # ---- ranking depends on mode ----
     if mode == "engagement":
@@ -127,44 +193,66 @@ def main():
     else:  # roi
         sort_key = "pred_score"
 
-    df_scores = pd.DataFrame(predictions)
-    top_df = df_scores.sort_values(sort_key, ascending=False).head(5)
-
-    top_campaigns = []
-    for _, r in top_df.iterrows():
-        top_campaigns.append(
-            {
-                "campaign_id": r["campaign_id"],
-                "pred_score": round(float(r["pred_score"]), 4),
-                "pred_roas": round(float(r["pred_score"]), 4),  # same value
-                "ctr": round(float(r["ctr"]), 4),
-                "conversion_rate": round(float(r["conversion_rate"]), 4),
-                "cpc": round(float(r["cpc"]), 4),
-            }
-        )
+    from csv_utils import CSVReadError, iter_csv
+
+    # ---- score the file chunk by chunk ----
+    predictions = []
+    candidates = []
+    total = 0
+    try:
+        for df in iter_csv(csv_path, FEATURES + ["campaign_id"]):
+            if total == 0:
+                missing = [c for c in FEATURES if c not in df.columns]
+                if missing:
+                    return {"error": f"Missing columns: {', '.join(missing)}"}
+
+            try:
+                scores = score_chunk(df, total, model, scaling)
+            except RuntimeError as e:
+                return {"error": str(e)}
+
+            predictions.extend(scores.to_dict(orient="records"))
+            # Only a chunk's own top 5 can reach the overall top 5
+            candidates.extend(scores.nlargest(5, sort_key).to_dict(orient="records"))
+            total += len(df)
+    except CSVReadError as e:
+        return {"error": f"Failed to read CSV: {e}"}
+
+    # Stable, so ties keep file order like DataFrame.nlargest
+    top_campaigns = heapq.nlargest(5, candidates, key=lambda r: r[sort_key])
 
     # For compatibility with old frontend names:
-    top_recommendations = []
-    for item in top_campaigns:
-        top_recommendations.append(
-            {
-                "campaign_id": item["campaign_id"],
-                "pred_roas": item["pred_roas"],
-                "suggestion": "Prioritise this campaign based on the selected performance mode.",
-            }
-        )
-
-    result = {
+    top_recommendations = [
+        {"campaign_id": item["campaign_id"], "pred_roas": item["pred_roas"], "suggestion": SUGGESTION}
+        for item in top_campaigns
+    ]
+
+    return {
         "mode": mode,
         "metric_name": metric_name,
-        "total_campaigns": int(len(df)),
+        "total_campaigns": int(total),
         "predictions": predictions,
         "top_campaigns": top_campaigns,
         # old names your React is already using
         "top_recommendations": top_recommendations,
     }
 
-    print(json.dumps(result))
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        serve_requests(score_performance_json, load_model, MODES, "roi")
+        return
+
+    if len(sys.argv) < 2:
+        error("No CSV path provided")
+
+    csv_path = sys.argv[1]
+    mode = sys.argv[2] if len(sys.argv) >= 3 else "roi"
+
+    text, ok = score_performance_json(csv_path, mode)
+    print(text)
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
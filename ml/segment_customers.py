@@ -6,9 +6,17 @@
 # ===============================================
 import sys
 import json
-import pandas as pd
-import joblib
+import importlib.util
 import os
+import result_cache
+from model_utils import (
+    cached_by_mtime,
+    load_scaler_and_model,
+    newest_mtime,
+    scaler_params,
+    serve_requests,
+    standardize,
+)
 
 # Base feature set from your dataset
 FEATURES = [
@@ -40,6 +48,11 @@ ENGAGEMENT_FEATURES = [
     "category_preference_score",
 ]
 
+MODES = ("behavior", "campaign", "engagement")
+
+# mode -> (model files' mtime, loaded model), see load_model
+_MODEL_CACHE = {}
+
 # Persona keys and display names
 PERSONAS = {
     "eco_lux": "Eco-Lux Loyalists",
@@ -48,18 +61,59 @@ PERSONAS = {
 }
 
 
-def min_max_norm(value, min_v, max_v):
-    """Normalize to 0–1 using min–max; if all equal, return 0.5."""
-    if max_v == min_v:
-        return 0.5
-    return (value - min_v) / (max_v - min_v)
+HAS_NUMBA = importlib.util.find_spec("numba") is not None
 
+# Below this many clusters NumPy is faster than calling the compiled kernel
+NUMBA_MIN_CLUSTERS = 64
 
-def assign_clusters(df: pd.DataFrame, mode: str):
-    """
-    For each mode, load the corresponding pre-trained scaler + model
-    and assign clusters.
-    """
+# Per-cluster average reported for each input feature
+STAT_COLUMNS = {
+    "age": "avg_age",
+    "monthly_spend": "avg_monthly_spend",
+    "avg_order_value": "avg_order_value",
+    "orders_per_month": "avg_orders_per_month",
+    "visits_per_month": "avg_visits_per_month",
+    "category_preference_score": "avg_category_preference_score",
+}
+
+# Cluster averages used for persona scoring, in matrix column order
+SCORE_COLS = [
+    "avg_monthly_spend",
+    "avg_order_value",
+    "avg_orders_per_month",
+    "avg_visits_per_month",
+    "avg_category_preference_score",
+]
+
+
+def min_max_norm(values):
+    """Normalize each column to 0–1 using min–max; constant columns become 0.5."""
+    import numpy as np
+    lo, hi = values.min(axis=0), values.max(axis=0)
+    rng = np.where(hi == lo, 1.0, hi - lo)
+    return np.where(hi == lo, 0.5, (values - lo) / rng)
+
+
+def persona_scores(values):
+    """(K, 5) cluster averages in SCORE_COLS order -> (K, 3) scores in PERSONAS order."""
+    import numpy as np
+    if HAS_NUMBA and len(values) >= NUMBA_MIN_CLUSTERS:
+        from persona_kernel import score_kernel
+        return score_kernel(values)
+
+    ns, na, no, nv, npref = min_max_norm(values).T
+    # Same persona logic; which cluster matches which persona will depend on mode.
+    return np.column_stack(
+        [
+            (ns + na + no) / 3.0,  # eco_lux
+            (nv + npref) / 2.0,  # aspiring
+            ((1 - no) + (1 - nv) + ns) / 3.0,  # gift
+        ]
+    )
+
+
+def model_paths(mode: str):
+    """Return (feat_cols, pipeline_path, scaler_path, model_path) for mode."""
     base_dir = os.path.dirname(os.path.abspath(__file__))
     models_dir = os.path.join(base_dir, "models")
 
@@ -73,154 +127,142 @@ def assign_clusters(df: pd.DataFrame, mode: str):
         prefix = "segmentation"
         feat_cols = BEHAVIOR_FEATURES
 
+    pipeline_path = os.path.join(models_dir, f"{prefix}_pipeline.pkl")
     scaler_path = os.path.join(models_dir, f"{prefix}_scaler.pkl")
     model_path = os.path.join(models_dir, f"{prefix}_model.pkl")
+    return feat_cols, pipeline_path, scaler_path, model_path
+
 
-    if not os.path.exists(scaler_path) or not os.path.exists(model_path):
+def model_mtime(mode: str) -> float:
+    """Newest mtime among the model files for mode (0.0 if none exist)."""
+    return newest_mtime(model_paths(mode)[1:])
+
+
+def load_model(mode: str):
+    """Return ((mean, scale), model), reusing the loaded files until they change on disk."""
+    return cached_by_mtime(_MODEL_CACHE, mode, model_mtime(mode), lambda: _load_model(mode))
+
+
+def _load_model(mode: str):
+    feat_cols, pipeline_path, scaler_path, model_path = model_paths(mode)
+
+    try:
+        loaded = load_scaler_and_model(pipeline_path, scaler_path, model_path)
+    except Exception as e:
+        # Corrupt or incompatible pickle: report it for this mode only
+        raise RuntimeError(f"Failed to load model for mode '{mode}': {e}")
+    if loaded is None:
         raise FileNotFoundError(
             f"Model or scaler not found for mode '{mode}'. "
-            f"Expected:\n  {scaler_path}\n  {model_path}"
+            f"Expected:\n  {pipeline_path}\n"
+            f"or:\n  {scaler_path}\n  {model_path}"
         )
+    scaler, model, input_dtype = loaded
+    return scaler_params(scaler, len(feat_cols), input_dtype), model
 
-    scaler = joblib.load(scaler_path)
-    model = joblib.load(model_path)
 
-    X = df[feat_cols]
-    X_scaled = scaler.transform(X)
-    clusters = model.predict(X_scaled)
+def assign_clusters(df, mode: str):
+    """
+    For each mode, use the corresponding pre-trained scaler + model
+    to assign clusters.
+    """
+    feat_cols = model_paths(mode)[0]
+    scaling, model = load_model(mode)
+
+    clusters = model.predict(standardize(df[feat_cols], scaling))
     df["cluster"] = clusters
     return df
 
 
-def main():
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "No CSV file path provided"}))
-        sys.exit(1)
+def normalize_mode(mode):
+    """Lowercased mode, or "behavior" if it isn't one of MODES."""
+    mode = mode.lower() if mode else "behavior"
+    return mode if mode in MODES else "behavior"
 
-    csv_path = sys.argv[1]
-    mode = sys.argv[2].lower() if len(sys.argv) >= 3 else "behavior"
-    if mode not in ("behavior", "campaign", "engagement"):
-        mode = "behavior"
 
-    if not os.path.exists(csv_path):
-        print(json.dumps({"error": f"File not found: {csv_path}"}))
-        sys.exit(1)
-
-    # Load data
-    df = pd.read_csv(csv_path)
-
-    # Check required columns
-    missing = [col for col in FEATURES if col not in df.columns]
-    if missing:
-        print(json.dumps({"error": f"Missing columns: {', '.join(missing)}"}))
-        sys.exit(1)
+def segment_customers_json(csv_path: str, mode: str = "behavior"):
+    """segment_customers() as (JSON text, ok); the same CSV bytes + mode + model files is a cache read."""
+    mode = normalize_mode(mode)
+    return result_cache.cached_json(
+        "segmentation", csv_path, mode, model_mtime(mode), lambda: segment_customers(csv_path, mode)
+    )
 
-    # ---- 1) Assign clusters depending on mode ----
-    try:
-        df = assign_clusters(df, mode)
-    except Exception as e:
-        print(json.dumps({"error": str(e)}))
-        sys.exit(1)
 
-    total = len(df)
-    cluster_stats = []
+def segment_customers(csv_path: str, mode: str = "behavior"):
+    """Segment the customers in csv_path; returns the result dict or {"error": ...}."""
+    mode = normalize_mode(mode)
 
-    # ---- 2) Compute metrics per cluster ----
-    for cluster_id, group in df.groupby("cluster"):
-        count = len(group)
-        percentage = (count / total) * 100 if total > 0 else 0
+    if not os.path.exists(csv_path):
+        return {"error": f"File not found: {csv_path}"}
 
-        avg_age = group["age"].mean()
-        avg_spend = group["monthly_spend"].mean()
-        avg_aov = group["avg_order_value"].mean()
-        avg_orders = group["orders_per_month"].mean()
-        avg_visits = group["visits_per_month"].mean()
-        avg_pref = group["category_preference_score"].mean()
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
+    from csv_utils import CSVReadError, iter_csv
 
-        cluster_stats.append(
-            {
-                "cluster": int(cluster_id),
-                "count": int(count),
-                "percentage": percentage,
-                "avg_age": avg_age,
-                "avg_monthly_spend": avg_spend,
-                "avg_order_value": avg_aov,
-                "avg_orders_per_month": avg_orders,
-                "avg_visits_per_month": avg_visits,
-                "avg_category_preference_score": avg_pref,
-            }
-        )
+    # ---- 1) + 2) Assign clusters chunk by chunk, summing stats per cluster ----
+    sums = None
+    valid = None
+    counts = None
+    total = 0
+    try:
+        for df in iter_csv(csv_path, FEATURES):
+            # Check required columns
+            if sums is None:
+                missing = [col for col in FEATURES if col not in df.columns]
+                if missing:
+                    return {"error": f"Missing columns: {', '.join(missing)}"}
+
+            try:
+                df = assign_clusters(df, mode)
+            except Exception as e:
+                return {"error": str(e)}
+
+            grouped = df.groupby("cluster")
+            part_sums = grouped[FEATURES].sum()
+            # Non-missing values per column: columns the mode doesn't cluster
+            # on may hold NaN, which sum() skips
+            part_valid = grouped[FEATURES].count()
+            part_counts = grouped.size()
+            if sums is None:
+                sums, valid, counts = part_sums, part_valid, part_counts
+            else:
+                sums = sums.add(part_sums, fill_value=0)
+                valid = valid.add(part_valid, fill_value=0)
+                counts = counts.add(part_counts, fill_value=0)
+            total += len(df)
+    except CSVReadError as e:
+        return {"error": f"Failed to read CSV: {e}"}
+
+    if sums is None:
+        return {"mode": mode, "total_customers": 0, "segments": []}
+
+    # Means from the running sums / non-missing counts, like groupby().mean()
+    # (one chunk for typical files)
+    agg = sums.div(valid).rename(columns=STAT_COLUMNS)
+    agg.insert(0, "count", counts.astype(int))
+    agg = agg.reset_index()
+    agg["percentage"] = agg["count"] / total * 100 if total > 0 else 0
+    cluster_stats = agg.to_dict(orient="records")
 
     if not cluster_stats:
-        print(json.dumps({"mode": mode, "total_customers": 0, "segments": []}))
-        sys.exit(0)
-
-    # ---- 3) Build min–max ranges across clusters (for persona scoring) ----
-    spends = [c["avg_monthly_spend"] for c in cluster_stats]
-    aovs = [c["avg_order_value"] for c in cluster_stats]
-    orders = [c["avg_orders_per_month"] for c in cluster_stats]
-    visits = [c["avg_visits_per_month"] for c in cluster_stats]
-    prefs = [c["avg_category_preference_score"] for c in cluster_stats]
-
-    min_spend, max_spend = min(spends), max(spends)
-    min_aov, max_aov = min(aovs), max(aovs)
-    min_orders, max_orders = min(orders), max(orders)
-    min_visits, max_visits = min(visits), max(visits)
-    min_pref, max_pref = min(prefs), max(prefs)
-
-    # ---- 4) Compute scores per persona for each cluster ----
-    for c in cluster_stats:
-        ns = min_max_norm(c["avg_monthly_spend"], min_spend, max_spend)
-        na = min_max_norm(c["avg_order_value"], min_aov, max_aov)
-        no = min_max_norm(c["avg_orders_per_month"], min_orders, max_orders)
-        nv = min_max_norm(c["avg_visits_per_month"], min_visits, max_visits)
-        np = min_max_norm(
-            c["avg_category_preference_score"], min_pref, max_pref
-        )
+        return {"mode": mode, "total_customers": 0, "segments": []}
 
-        # Same persona logic; which cluster matches which persona will depend on mode.
-        eco_lux_score = (ns + na + no) / 3.0
-        aspiring_score = (nv + np) / 2.0
-        gift_score = ((1 - no) + (1 - nv) + ns) / 3.0
-
-        c["scores"] = {
-            "eco_lux": eco_lux_score,
-            "aspiring": aspiring_score,
-            "gift": gift_score,
-        }
+    # ---- 3) + 4) Min–max normalize the averages and score each persona ----
+    persona_keys = list(PERSONAS.keys())  # ["eco_lux", "aspiring", "gift"]
+    score_matrix = persona_scores(
+        np.array([[c[col] for col in SCORE_COLS] for c in cluster_stats], dtype=np.float64)
+    )
+    for c, row in zip(cluster_stats, score_matrix.tolist()):
+        c["scores"] = dict(zip(persona_keys, row))
 
     # ---- 5) Assign each persona to one cluster (smart mapping) ----
-    persona_keys = list(PERSONAS.keys())  # ["eco_lux", "aspiring", "gift"]
-    assigned = {}  # cluster_id -> persona_key
-    used_personas = set()
-
-    while len(assigned) < len(cluster_stats) and len(used_personas) < len(
-        persona_keys
-    ):
-        best_cluster = None
-        best_persona = None
-        best_score = -1.0
-
-        for c in cluster_stats:
-            cid = c["cluster"]
-            if cid in assigned:
-                continue
-            for p in persona_keys:
-                if p in used_personas:
-                    continue
-                s = c["scores"][p]
-                if s > best_score:
-                    best_score = s
-                    best_cluster = cid
-                    best_persona = p
-
-        if best_cluster is None:
-            break
-
-        assigned[best_cluster] = best_persona
-        used_personas.add(best_persona)
-
-    # Any remaining clusters → assign by max score
+    # One-to-one mapping that maximizes the total persona score
+    rows, cols = linear_sum_assignment(score_matrix, maximize=True)
+    assigned = {  # cluster_id -> persona_key
+        cluster_stats[r]["cluster"]: persona_keys[p] for r, p in zip(rows, cols)
+    }
+
+    # Any remaining clusters (more clusters than personas) → assign by max score
     for c in cluster_stats:
         cid = c["cluster"]
         if cid not in assigned:
@@ -258,13 +300,29 @@ def main():
     # Sort segments by persona score (descending)
     segments.sort(key=lambda s: s["score"], reverse=True)
 
-    result = {
+    return {
         "mode": mode,
         "total_customers": int(total),
         "segments": segments,
     }
 
-    print(json.dumps(result))
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        serve_requests(segment_customers_json, load_model, MODES, "behavior")
+        return
+
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "No CSV file path provided"}))
+        sys.exit(1)
+
+    csv_path = sys.argv[1]
+    mode = sys.argv[2] if len(sys.argv) >= 3 else "behavior"
+
+    text, ok = segment_customers_json(csv_path, mode)
+    print(text)
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
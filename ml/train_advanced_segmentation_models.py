@@ -13,7 +13,8 @@ import os
 import joblib
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.pipeline import Pipeline
 
 # Base features available in your dataset
 FEATURES = [
@@ -45,11 +46,21 @@ ENGAGEMENT_FEATURES = [
     "category_preference_score",
 ]
 
+# From this many rows on, cluster with mini-batches instead of full Lloyd passes
+MINIBATCH_MIN_ROWS = 100_000
+
+
+def make_kmeans(n_rows):
+    """KMeans for small files, MiniBatchKMeans for large ones (same kind of model)."""
+    if n_rows >= MINIBATCH_MIN_ROWS:
+        return MiniBatchKMeans(n_clusters=3, batch_size=4096, n_init=3, random_state=42)
+    return KMeans(n_clusters=3, random_state=42, n_init=10)
+
 
 def train_and_save(df, features, model_name_prefix):
     """
-    Train a KMeans model + StandardScaler on selected features
-    and save them under ml/models as <prefix>_scaler.pkl / <prefix>_model.pkl
+    Train a (MiniBatch)KMeans model + StandardScaler on selected features
+    and save them together under ml/models as <prefix>_pipeline.pkl
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
     models_dir = os.path.join(base_dir, "models")
@@ -60,18 +71,18 @@ def train_and_save(df, features, model_name_prefix):
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
+    kmeans = make_kmeans(len(X))
     kmeans.fit(X_scaled)
 
-    scaler_path = os.path.join(models_dir, f"{model_name_prefix}_scaler.pkl")
-    model_path = os.path.join(models_dir, f"{model_name_prefix}_model.pkl")
+    pipeline_path = os.path.join(models_dir, f"{model_name_prefix}_pipeline.pkl")
 
-    joblib.dump(scaler, scaler_path)
-    joblib.dump(kmeans, model_path)
+    # One file per mode: predictors load scaler + model in a single read
+    # (uncompressed, so they can memory-map its arrays)
+    pipeline = Pipeline([("scaler", scaler), ("model", kmeans)])
+    joblib.dump(pipeline, pipeline_path)
 
     print(f"Trained {model_name_prefix} model on features: {features}")
-    print(f"  -> Scaler saved to: {scaler_path}")
-    print(f"  -> Model  saved to: {model_path}\n")
+    print(f"  -> Scaler + model saved to: {pipeline_path}\n")
 
 
 def main():
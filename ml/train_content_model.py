@@ -1,9 +1,9 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score
-import pickle
+import joblib
 
 DATA_PATH = "ml/data/content_train.csv"
 MODEL_PATH = "ml/models/content_model.pkl"
@@ -20,7 +20,8 @@ def main():
         "avg_roas",
         "sample_size",
     ]
-    X = df[feature_cols]
+    # Fit on a plain array, which is what recommend_content.py predicts on
+    X = df[feature_cols].to_numpy(dtype=np.float64)
 
     # 3. Create a synthetic "performance score" target
     #    (higher engagement + conversion + ROAS → higher score)
@@ -35,11 +36,13 @@ def main():
         X, y, test_size=0.2, random_state=42
     )
 
-    # 5. Train RandomForest model
-    model = RandomForestRegressor(
-        n_estimators=200,
+    # 5. Train gradient-boosted trees (compact model, fast predict)
+    model = HistGradientBoostingRegressor(
+        max_iter=300,
+        learning_rate=0.05,
+        max_depth=6,
+        early_stopping="auto",
         random_state=42,
-        n_jobs=-1,
     )
     model.fit(X_train, y_train)
 
@@ -49,8 +52,8 @@ def main():
     print(f"Validation R²: {r2:.3f}")
 
     # 7. Save the **model**, not the predictions
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(model, f)
+    #    (joblib, uncompressed, so predictors can memory-map its arrays)
+    joblib.dump(model, MODEL_PATH)
 
     print(f"Saved content recommendation model to {MODEL_PATH}")
 
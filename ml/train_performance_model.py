@@ -1,8 +1,4 @@
-import os, joblib, pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import r2_score, mean_absolute_error
-from sklearn.preprocessing import StandardScaler
+import os
 
 # ====== EXPECTED COLUMNS in your campaign CSV ======
 # campaign_id, impressions, clicks, spend, conversions, sessions, add_to_carts, avg_session_duration
@@ -16,22 +12,35 @@ FEATURES = [
 ]
 TARGET = "roas"  # numeric
 
-df = pd.read_csv("data/campaigns_train.csv")   # put your training file here
-X, y = df[FEATURES], df[TARGET]
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+def main():
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import r2_score, mean_absolute_error
+    from sklearn.preprocessing import StandardScaler
 
-X_tr, X_te, y_tr, y_te = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+    df = pd.read_csv("data/campaigns_train.csv")   # put your training file here
+    X, y = df[FEATURES], df[TARGET]
 
-rf = RandomForestRegressor(n_estimators=300, random_state=42)
-rf.fit(X_tr, y_tr)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
 
-pred = rf.predict(X_te)
-print("R^2:", round(r2_score(y_te, pred), 4))
-print("MAE:", round(mean_absolute_error(y_te, pred), 4))
+    X_tr, X_te, y_tr, y_te = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
 
-os.makedirs("models", exist_ok=True)
-joblib.dump(rf, "models/perf_model.pkl")
-joblib.dump(scaler, "models/perf_scaler.pkl")
-print("✅ Saved models/perf_model.pkl & models/perf_scaler.pkl")
+    rf = RandomForestRegressor(n_estimators=300, n_jobs=-1, min_samples_leaf=5, random_state=42)
+    rf.fit(X_tr, y_tr)
+
+    pred = rf.predict(X_te)
+    print("R^2:", round(r2_score(y_te, pred), 4))
+    print("MAE:", round(mean_absolute_error(y_te, pred), 4))
+
+    os.makedirs("models", exist_ok=True)
+    joblib.dump(rf, "models/perf_model.pkl")
+    joblib.dump(scaler, "models/perf_scaler.pkl")
+    print("✅ Saved models/perf_model.pkl & models/perf_scaler.pkl")
+
+
+if __name__ == "__main__":
+    main()